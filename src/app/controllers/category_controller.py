@@ -0,0 +1,34 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db
+from app.core.response import ExtensionResponse
+from app.repositories.category_repository import CategoryRepository
+from app.services.category_service import CategoryService
+
+router = APIRouter(prefix="/api/categories", tags=["categories"])
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def get_category_service():
+    return CategoryService(CategoryRepository())
+
+@router.get("")
+async def get_categories(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    service: CategoryService = Depends(get_category_service),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await service.get_categories(db, limit=limit, after=after)
+    return ExtensionResponse(result)
+
+@router.get("/{category_id}/stats")
+async def get_category_stats(
+    category_id: str,
+    service: CategoryService = Depends(get_category_service),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await service.get_category_stats(db, category_id)
+    return ExtensionResponse(result)
@@ -1,80 +1,208 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
-from app.services.product_service import ProductService
+from app.services.product_service import ProductService, product_detail_cache, product_detail_flight
+from app.services.export_service import EXPORT_MEDIA_TYPES, ExportService
 from app.repositories.product_repository import ProductRepository
-from app.core.response import ResponseExtension
-from app.domain.schemas import ProductCreateSchema
+from app.core.etag import catalog_etag, etag_matches, not_modified, product_etag
+from app.core.response import ExtensionResponse, ResponseExtension
+from app.domain.schemas import (
+    ExportFormat, ProductCreateSchema, ProductFilterSchema, ProductSort, ReservationItemSchema, ReservationSchema,
+    parse_product_fields,
+)
 import logging
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_BATCH_SIZE = 10000
+MAX_CART_SIZE = 500
+
 def get_product_service():
-    return ProductService(ProductRepository())
+    return ProductService(ProductRepository(), detail_cache=product_detail_cache, single_flight=product_detail_flight)
+
+def get_export_service():
+    return ExportService(ProductRepository())
+
+def invalid_fields(ex: ValueError) -> ExtensionResponse:
+    return ExtensionResponse(ResponseExtension.response(status_code=400, message=str(ex)))
 
 @router.post("")
 async def create_product(
     product: ProductCreateSchema,
     service: ProductService = Depends(get_product_service),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     result = await service.create_product(db, product)
-    return JSONResponse(
-        status_code=result.status_code, 
-        content=result.model_dump()
-    )
+    return ExtensionResponse(result)
+
+@router.post("/batch")
+async def create_products_batch(
+    products: List[ProductCreateSchema] = Body(..., min_length=1, max_length=MAX_BATCH_SIZE),
+    service: ProductService = Depends(get_product_service),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await service.create_products_batch(db, products)
+    return ExtensionResponse(result)
+
+@router.post("/reserve")
+async def reserve_cart(
+    items: List[ReservationItemSchema] = Body(..., min_length=1, max_length=MAX_CART_SIZE),
+    service: ProductService = Depends(get_product_service),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await service.reserve_cart(db, items)
+    return ExtensionResponse(result)
+
+@router.post("/{product_id}/reserve")
+async def reserve_product(
+    product_id: str,
+    reservation: ReservationSchema = Body(default_factory=ReservationSchema),
+    service: ProductService = Depends(get_product_service),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await service.reserve_product(db, product_id, reservation.quantity)
+    return ExtensionResponse(result)
 
 @router.get("")
 async def get_all_products(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    category_id: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    condition: Optional[str] = None,
+    in_stock: Optional[bool] = None,
+    sort: ProductSort = ProductSort.ID,
+    stream: bool = False,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    service: ProductService = Depends(get_product_service),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        selected = parse_product_fields(fields)
+    except ValueError as ex:
+        return invalid_fields(ex)
+
+    filters = ProductFilterSchema(
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        condition=condition,
+        in_stock=in_stock,
+        sort=sort,
+    )
+
+    if stream:
+        # NDJSON: one product per line, rows pulled from a server-side cursor as the client reads
+        async def ndjson():
+            async for product in service.stream_products(db, after, filters, fields=selected):
+                yield product.__pydantic_serializer__.to_json(product) + b"\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    # Any catalog write bumps the version, so it validates every page and filter combination.
+    # It is read before the page, so a concurrent write can only make the tag older.
+    etag = catalog_etag(await service.get_catalog_version(db))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    result = await service.get_all_products(db, limit=limit, after=after, filters=filters, fields=selected)
+    headers = {"ETag": etag} if result.status_code == 200 else None
+    return ExtensionResponse(result, headers=headers)
+
+@router.get("/search")
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, pattern=r"^\d+$"),
     service: ProductService = Depends(get_product_service),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
+):
+    result = await service.search_products(db, q, limit=limit, after=after)
+    return ExtensionResponse(result)
+
+@router.get("/export")
+async def export_products(
+    export_format: ExportFormat = Query(ExportFormat.JSONL, alias="format"),
+    gzip: bool = False,
+    category_id: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    condition: Optional[str] = None,
+    in_stock: Optional[bool] = None,
+    service: ExportService = Depends(get_export_service),
+    db: AsyncSession = Depends(get_db)
 ):
-    result = await service.get_all_products(db)
-    # Re-build the response extension data by dumping individual models to prevent serialization issues with 'Any'
-    if result.data:
-        result.data = [item.model_dump() for item in result.data]
-    
-    return JSONResponse(
-        status_code=result.status_code, 
-        content=result.model_dump()
+    filters = ProductFilterSchema(
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        condition=condition,
+        in_stock=in_stock,
+    )
+    headers = {"Content-Disposition": f'attachment; filename="products.{export_format.value}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        service.export_products(db, export_format, filters=filters, compress=gzip),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers=headers,
     )
 
 @router.get("/{product_id}")
 async def get_product(
     product_id: str, 
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     service: ProductService = Depends(get_product_service),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    result = await service.get_product_detail(db, product_id)
-    if result.data and hasattr(result.data, "model_dump"):
-        result.data = result.data.model_dump()
-        
-    return JSONResponse(
-        status_code=result.status_code, 
-        content=result.model_dump()
-    )
+    try:
+        selected = parse_product_fields(fields)
+    except ValueError as ex:
+        return invalid_fields(ex)
+
+    if if_none_match:
+        version = await service.get_product_version(db, product_id)
+        if version is not None and etag_matches(if_none_match, product_etag(product_id, version)):
+            return not_modified(product_etag(product_id, version))
+
+    # Cached results keep their encoded body, so a cache hit skips serialization entirely
+    result = await service.get_product_detail(db, product_id, fields=selected)
+    headers = None
+    if result.status_code == 200 and result.data.version is not None:
+        headers = {"ETag": product_etag(product_id, result.data.version)}
+    return ExtensionResponse(result, headers=headers)
+
+@router.delete("")
+async def delete_products(
+    product_ids: List[str] = Body(..., min_length=1, max_length=MAX_BATCH_SIZE),
+    service: ProductService = Depends(get_product_service),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await service.delete_products(db, product_ids)
+    return ExtensionResponse(result)
 
 @router.delete("/erase")
 async def delete_all_products(
     service: ProductService = Depends(get_product_service),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     result = await service.delete_all_products(db)
-    return JSONResponse(
-        status_code=result.status_code, 
-        content=result.model_dump()
-    )
+    return ExtensionResponse(result)
 
 @router.delete("/{product_id}")
 async def delete_product(
     product_id: str,
     service: ProductService = Depends(get_product_service),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     result = await service.delete_product(db, product_id)
-    return JSONResponse(
-        status_code=result.status_code, 
-        content=result.model_dump()
-    )
+    return ExtensionResponse(result)
@@ -0,0 +1,131 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from app.core.workers import SharedCounter
+
+class LRUCache:
+    """
+    Bounded in-process cache with least-recently-used eviction and a per-entry TTL.
+    Not thread-safe: it is meant to be used from the event loop only.
+
+    With a `shared_counter`, invalidations are announced to the other worker
+    processes by recording the key in it, and a cache that sees changes made by
+    another worker drops those keys before the next lookup. It clears itself when
+    it cannot tell which keys changed (a clear, or more changes than the counter
+    remembers).
+    """
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, shared_counter: Optional[SharedCounter] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared_counter = shared_counter
+        self._seen_changes = shared_counter.value if shared_counter is not None else 0
+        self.remote_invalidations = 0
+        self.remote_clears = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Bumped on every invalidation so a read that raced a write can avoid caching stale data
+        self.generation = 0
+
+    def _sync(self) -> None:
+        if self.shared_counter is None:
+            return
+        changes = self.shared_counter.value
+        if changes == self._seen_changes:
+            return
+        keys = self.shared_counter.changed_keys(self._seen_changes, changes)
+        self._seen_changes = changes
+        self.generation += 1
+        if keys is None:
+            self._entries.clear()
+            self.remote_clears += 1
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+        self.remote_invalidations += len(keys)
+
+    def _announce(self, key: Optional[Hashable] = None) -> None:
+        if self.shared_counter is None:
+            return
+        value = self.shared_counter.increment(key)
+        # Only our own change happened since the last sync; otherwise the next lookup applies the others
+        if value == self._seen_changes + 1:
+            self._seen_changes = value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        self._sync()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns a live entry without touching the LRU order or the counters.
+        """
+        self._sync()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Stores `value`. When `generation` is given (read before loading the value), the
+        write is skipped if any invalidation happened in between.
+        """
+        if self.maxsize <= 0:
+            return
+        self._sync()
+        if generation is not None and generation != self.generation:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self.generation += 1
+        self._entries.pop(key, None)
+        self._announce(key)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._announce()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "remote_invalidations": self.remote_invalidations,
+            "remote_clears": self.remote_clears,
+        }
@@ -0,0 +1,109 @@
+import asyncio
+import zlib
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+def supported_encodings() -> tuple:
+    """
+    Content codings this process can produce, in order of preference.
+    """
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Picks the preferred supported coding from an Accept-Encoding header, honouring
+    q-values (`q=0` refuses a coding) and `*`. Returns None for the identity coding.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported_encodings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # wbits | 16 writes the gzip container instead of a raw zlib stream
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress(body) + compressor.flush()
+
+async def compress_async(body: bytes, encoding: str) -> bytes:
+    """
+    Compresses `body`, on a worker thread when it is at least
+    COMPRESSION_OFFLOAD_MIN_SIZE bytes so large bodies don't stall the event loop.
+    zlib and brotli release the GIL while compressing.
+    """
+    if len(body) >= settings.compression_offload_min_size:
+        return await asyncio.to_thread(compress, body, encoding)
+    return compress(body, encoding)
+
+class StreamCompressor:
+    """
+    Incremental compressor for streamed bodies. Every chunk is flushed, so the
+    client can decode each one as it arrives instead of waiting for the end.
+    """
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def _compress_chunk(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    async def compress(self, chunk: bytes) -> bytes:
+        if len(chunk) >= settings.compression_offload_min_size:
+            return await asyncio.to_thread(self._compress_chunk, chunk)
+        return self._compress_chunk(chunk)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+def weak_etag(etag: str) -> str:
+    """
+    A compressed representation is not byte-identical to the plain one, so its
+    strong validator is turned into a weak one; If-None-Match still matches it.
+    """
+    return etag if etag.startswith("W/") else "W/" + etag
+
+def add_vary_accept_encoding(headers: MutableHeaders) -> None:
+    vary = headers.get("vary", "")
+    if "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
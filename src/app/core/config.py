@@ -0,0 +1,84 @@
+import os
+from dataclasses import dataclass
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def _env_str(name: str, default: str) -> str:
+    return os.getenv(name) or default
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Runtime configuration, read once at startup from environment variables.
+    """
+    database_url: str = "sqlite+aiosqlite:///:memory:"
+    db_pool: str = "queue"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size: int = -64000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+    workers: int = 1
+    db_busy_retries: int = 3
+    db_busy_retry_delay_ms: int = 10
+    catalog_import_dir: str = ""
+    import_batch_size: int = 5000
+    product_cache_size: int = 1024
+    product_cache_ttl_seconds: float = 60.0
+    compression_min_size: int = 1024
+    compression_offload_min_size: int = 64 * 1024
+    log_level: str = "DEBUG"
+    log_format: str = "text"
+    log_file: str = "app.log"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_queue_size: int = 10000
+    access_log_sample_rate: float = 1.0
+    slow_query_ms: float = 200.0
+    profile_dir: str = "profiles"
+    profile_sample_rate: float = 0.0
+    profile_token: str = ""
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=_env_str("DATABASE_URL", cls.database_url),
+            db_pool=_env_str("DB_POOL", cls.db_pool).lower(),
+            db_pool_size=_env_int("DB_POOL_SIZE", cls.db_pool_size),
+            db_max_overflow=_env_int("DB_MAX_OVERFLOW", cls.db_max_overflow),
+            sqlite_journal_mode=_env_str("SQLITE_JOURNAL_MODE", cls.sqlite_journal_mode).upper(),
+            sqlite_synchronous=_env_str("SQLITE_SYNCHRONOUS", cls.sqlite_synchronous).upper(),
+            sqlite_cache_size=_env_int("SQLITE_CACHE_SIZE", cls.sqlite_cache_size),
+            sqlite_mmap_size=_env_int("SQLITE_MMAP_SIZE", cls.sqlite_mmap_size),
+            sqlite_busy_timeout_ms=_env_int("SQLITE_BUSY_TIMEOUT_MS", cls.sqlite_busy_timeout_ms),
+            workers=_env_int("WEB_CONCURRENCY", cls.workers),
+            db_busy_retries=_env_int("DB_BUSY_RETRIES", cls.db_busy_retries),
+            db_busy_retry_delay_ms=_env_int("DB_BUSY_RETRY_DELAY_MS", cls.db_busy_retry_delay_ms),
+            catalog_import_dir=_env_str("CATALOG_IMPORT_DIR", cls.catalog_import_dir),
+            import_batch_size=_env_int("IMPORT_BATCH_SIZE", cls.import_batch_size),
+            product_cache_size=_env_int("PRODUCT_CACHE_SIZE", cls.product_cache_size),
+            product_cache_ttl_seconds=_env_float("PRODUCT_CACHE_TTL_SECONDS", cls.product_cache_ttl_seconds),
+            compression_min_size=_env_int("COMPRESSION_MIN_SIZE", cls.compression_min_size),
+            compression_offload_min_size=_env_int("COMPRESSION_OFFLOAD_MIN_SIZE", cls.compression_offload_min_size),
+            log_level=_env_str("LOG_LEVEL", cls.log_level).upper(),
+            log_format=_env_str("LOG_FORMAT", cls.log_format).lower(),
+            log_file=_env_str("LOG_FILE", cls.log_file),
+            log_max_bytes=_env_int("LOG_MAX_BYTES", cls.log_max_bytes),
+            log_backup_count=_env_int("LOG_BACKUP_COUNT", cls.log_backup_count),
+            log_queue_size=_env_int("LOG_QUEUE_SIZE", cls.log_queue_size),
+            access_log_sample_rate=_env_float("ACCESS_LOG_SAMPLE_RATE", cls.access_log_sample_rate),
+            slow_query_ms=_env_float("SLOW_QUERY_MS", cls.slow_query_ms),
+            profile_dir=_env_str("PROFILE_DIR", cls.profile_dir),
+            profile_sample_rate=_env_float("PROFILE_SAMPLE_RATE", cls.profile_sample_rate),
+            profile_token=_env_str("PROFILE_TOKEN", cls.profile_token),
+        )
+
+settings = Settings.from_env()
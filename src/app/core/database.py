@@ -1,18 +1,175 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import atexit
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, StaticPool
+from app.core.config import Settings, settings
+from app.core.logging.logger import trace_id_var
+from app.core.metrics import instrument_engine
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+slow_query_logger = logging.getLogger("app.slow_query")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_POOL_CLASSES = {
+    "queue": AsyncAdaptedQueuePool,
+    "null": NullPool,
+    "static": StaticPool,
+}
 
-Base = declarative_base()
+def is_memory_database(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:"
+
+def is_busy_error(ex: BaseException) -> bool:
+    """
+    SQLITE_BUSY and SQLITE_LOCKED: another connection held the lock for longer than
+    the busy timeout. The transaction can be retried.
+    """
+    if not isinstance(ex, OperationalError):
+        return False
+    message = str(ex.orig).lower()
+    return "database is locked" in message or "database table is locked" in message or "busy" in message
+
+def sqlite_pragmas(config: Settings) -> dict:
+    pragmas = {
+        "synchronous": config.sqlite_synchronous,
+        "cache_size": config.sqlite_cache_size,
+        "busy_timeout": config.sqlite_busy_timeout_ms,
+        # Off by default in SQLite; ON DELETE CASCADE relies on it
+        "foreign_keys": "ON",
+        # WAL lets readers proceed while a writer is active
+        "journal_mode": config.sqlite_journal_mode,
+        "mmap_size": config.sqlite_mmap_size,
+    }
+    if is_memory_database(config.database_url):
+        # The private database is thrown away at exit, so there is nothing to make durable
+        pragmas["synchronous"] = "OFF"
+    return pragmas
+
+def private_database_url(url: str) -> str:
+    """
+    Replaces an in-memory SQLite URL with a file in a temporary directory owned by
+    this process and removed at exit. Every connection to :memory: is a separate
+    database, so sharing one would give concurrent sessions no isolation: one
+    session's rollback would discard another's writes. A private file keeps the
+    throwaway catalog while each session gets its own connection and transaction.
+    """
+    directory = tempfile.mkdtemp(prefix="catalog-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return make_url(url).set(database=os.path.join(directory, "catalog.db")).render_as_string(hide_password=False)
+
+def create_engine_from_settings(config: Settings) -> AsyncEngine:
+    """
+    Builds the async engine from the runtime settings. aiosqlite runs every SQLite
+    call on a dedicated connection thread, so queries and commits are awaited
+    instead of blocking the event loop. Pragmas are applied on every new connection.
+    """
+    url = config.database_url
+    kwargs = {}
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+        if is_memory_database(url):
+            url = private_database_url(url)
+
+    pool_class = _POOL_CLASSES[config.db_pool]
+    kwargs["poolclass"] = pool_class
+    if pool_class is AsyncAdaptedQueuePool:
+        kwargs["pool_size"] = config.db_pool_size
+        kwargs["max_overflow"] = config.db_max_overflow
+
+    new_engine = create_async_engine(url, **kwargs)
+
+    if url.startswith("sqlite"):
+        pragmas = sqlite_pragmas(config)
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return new_engine
+
+# Statements EXPLAIN QUERY PLAN can describe; pragmas, DDL and transaction control are skipped
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b", re.IGNORECASE)
+_MAX_PARAMETERS_LENGTH = 500
 
-def get_db():
-    db = SessionLocal()
+def explain_query_plan(dbapi_connection, statement: str, parameters) -> list:
+    """
+    The EXPLAIN QUERY PLAN rows of `statement`, as indented "detail" lines, run on a
+    separate cursor of the connection that executed it.
+    """
+    if not _EXPLAINABLE.match(statement):
+        return []
+    cursor = dbapi_connection.cursor()
     try:
-        yield db
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        rows = cursor.fetchall()
     finally:
-        db.close()
+        cursor.close()
+    # Rows are (id, parent, notused, detail); children are indented under their parent
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+def instrument_slow_queries(sync_engine, threshold_ms: float) -> None:
+    """
+    Logs every statement that takes at least `threshold_ms` to the `app.slow_query`
+    logger: duration, trace id of the request, SQL, parameters and query plan. The
+    plan is only computed for slow statements, so fast ones pay for a timestamp.
+    """
+    threshold_ns = int(threshold_ms * 1e6)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # On the execution context, not the connection: nothing is left behind if the statement raises
+        if context is not None:
+            context.slow_query_start_ns = time.perf_counter_ns()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "slow_query_start_ns", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter_ns() - start
+        if elapsed < threshold_ns:
+            return
+        # executemany statements are explained with their first set of parameters
+        explained_parameters = parameters[0] if executemany and parameters else parameters
+        try:
+            plan = explain_query_plan(conn.connection.dbapi_connection, statement, explained_parameters)
+        except Exception as e:
+            plan = [f"unavailable: {e}"]
+        shown_parameters = repr(parameters)
+        if len(shown_parameters) > _MAX_PARAMETERS_LENGTH:
+            shown_parameters = shown_parameters[:_MAX_PARAMETERS_LENGTH] + "..."
+        slow_query_logger.warning(
+            "Slow query: %.1fms trace_id=%s%s\n  SQL: %s\n  Parameters: %s\n  Plan:\n    %s",
+            elapsed / 1e6, trace_id_var.get() or "-", " (executemany)" if executemany else "",
+            " ".join(statement.split()), shown_parameters, "\n    ".join(plan) or "-",
+        )
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+engine = create_engine_from_settings(settings)
+instrument_engine(engine.sync_engine)
+if settings.slow_query_ms > 0:
+    instrument_slow_queries(engine.sync_engine, settings.slow_query_ms)
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+Base = declarative_base()
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
@@ -0,0 +1,29 @@
+from typing import Optional
+from starlette.responses import Response
+
+def product_etag(product_id: str, version: int) -> str:
+    return f'"p-{product_id}-{version}"'
+
+def catalog_etag(version: int) -> str:
+    return f'"c-{version}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match uses the weak comparison: W/ prefixes are ignored and the header
+    may list several tags or be `*`.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
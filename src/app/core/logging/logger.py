@@ -1,12 +1,21 @@
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
+import zlib
 from logging import Formatter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from contextvars import ContextVar
-import uuid
+from app.core.config import settings
 
 # Context variable to store trace_id for the current request
 trace_id_var: ContextVar[str] = ContextVar("trace_id", default="")
 
+TEXT_FORMAT = "%(asctime)s | %(levelname)-8s | trace_id=%(trace_id)-36s | %(name)s:%(funcName)s:%(lineno)d - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 class TraceIdFilter(logging.Filter):
     """
     Log filter to inject trace_id into log records.
@@ -15,34 +24,116 @@ class TraceIdFilter(logging.Filter):
         record.trace_id = trace_id_var.get()
         return True
 
+class TraceSampler(logging.Filter):
+    """
+    Keeps only a fraction of the records below WARNING, decided per trace id so
+    every line of a sampled request is kept together. Warnings and errors always pass.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.threshold = int(max(0.0, min(rate, 1.0)) * 10000)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.threshold >= 10000:
+            return True
+        trace_id = trace_id_var.get()
+        return zlib.crc32(trace_id.encode()) % 10000 < self.threshold
+
+class JsonFormatter(Formatter):
+    """
+    Formats each record as a single JSON object per line.
+    """
+    def format(self, record):
+        entry = {
+            "timestamp": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "trace_id": getattr(record, "trace_id", ""),
+            "logger": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded queue drained by a background QueueListener, so the
+    caller (usually the event loop) never waits on stdout or disk. Message formatting
+    is deferred to the listener thread, and records are dropped if the queue is full.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The queue is in-process, so the record does not need to be pickled or pre-formatted
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def worker_log_file(path: str, workers: int) -> str:
+    """
+    Each worker process rotates its own file: several RotatingFileHandlers on one
+    file would rename it under each other and lose records. With more than one
+    worker the process id goes before the extension (`app.<pid>.log`).
+    """
+    if workers <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{ext}"
+
+_listener = None
+
 def setup_logging():
     """
-    Configures the application logger with JSON-like or structured formatting
-    including the Trace ID.
+    Configures the application logger with JSON or structured text formatting
+    including the Trace ID. Records go through a queue to a background listener
+    that owns the stdout and size-rotated file handlers.
     """
+    global _listener
     logger = logging.getLogger("app")
-    logger.setLevel(logging.DEBUG)
-    
+    logger.setLevel(settings.log_level)
+
     # Avoid adding multiple handlers if setup is called multiple times
     if not logger.handlers:
+        if settings.log_format == "json":
+            formatter = JsonFormatter()
+        else:
+            # Format: [Time] [Level] [TraceID] - Message
+            formatter = Formatter(fmt=TEXT_FORMAT, datefmt=DATE_FORMAT)
+
         handler = logging.StreamHandler(sys.stdout)
-        
-        # Format: [Time] [Level] [TraceID] - Message
-        formatter = Formatter(
-            fmt="%(asctime)s | %(levelname)-8s | trace_id=%(trace_id)-36s | %(name)s:%(funcName)s:%(lineno)d - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S"
-        )
-        
         handler.setFormatter(formatter)
-        handler.addFilter(TraceIdFilter())
-        logger.addHandler(handler)
-        
-        # Add a file handler to save logs to a file
-        file_handler = logging.FileHandler("app.log", encoding="utf-8")
+
+        # Save logs to a file, rotated by size
+        file_handler = RotatingFileHandler(
+            worker_log_file(settings.log_file, settings.workers),
+            maxBytes=settings.log_max_bytes,
+            backupCount=settings.log_backup_count,
+            encoding="utf-8"
+        )
         file_handler.setFormatter(formatter)
-        file_handler.addFilter(TraceIdFilter())
-        logger.addHandler(file_handler)
-        
+
+        # The trace id lives in a context variable, so it is captured on the calling side
+        queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+        queue_handler.addFilter(TraceIdFilter())
+        logger.addHandler(queue_handler)
+
+        _listener = QueueListener(queue_handler.queue, handler, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    # Per-request access lines are sampled to keep logging from throttling throughput
+    access_logger = logging.getLogger("app.access")
+    if not access_logger.filters:
+        access_logger.addFilter(TraceSampler(settings.access_log_sample_rate))
+
     # Also apply the filter to the root logger and uvicorn if needed
     for name in ["uvicorn", "uvicorn.error", "uvicorn.access", "fastapi"]:
         ext_logger = logging.getLogger(name)
@@ -52,3 +143,4 @@ def setup_logging():
 
 # Initialize global logger
 logger = setup_logging()
+access_logger = logging.getLogger("app.access")
@@ -0,0 +1,184 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+
+@dataclass
+class RequestTimings:
+    """
+    Time spent per phase of the current request, in nanoseconds. A fresh instance is
+    bound to `request_timings_var` for every request; SQLAlchemy events, validation
+    and rendering add to it and the metrics middleware reads it back.
+    """
+    db_queries: int = 0
+    db_ns: int = 0
+    phases: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, phase: str, elapsed_ns: int) -> None:
+        self.phases[phase] = self.phases.get(phase, 0) + elapsed_ns
+
+    def server_timing(self, total_ns: int) -> str:
+        entries = [f'db;dur={self.db_ns / 1e6:.2f};desc="{self.db_queries} queries"']
+        entries.extend(f"{phase};dur={elapsed / 1e6:.2f}" for phase, elapsed in self.phases.items())
+        entries.append(f"total;dur={total_ns / 1e6:.2f}")
+        return ", ".join(entries)
+
+request_timings_var: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """
+    Adds the duration of the block to `phase` of the current request, if any.
+    """
+    timings = request_timings_var.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter_ns() - start)
+
+def instrument_engine(sync_engine) -> None:
+    """
+    Counts queries and accumulates their execution time into the current request.
+    The start time lives on the execution context, which is discarded with the
+    statement, so a statement that raises leaves nothing behind on the connection.
+    """
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_start_ns = time.perf_counter_ns()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "query_start_ns", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter_ns() - start
+        timings = request_timings_var.get()
+        if timings is not None:
+            timings.db_queries += 1
+            timings.db_ns += elapsed
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # Per label set: non-cumulative bucket counts (last slot is +Inf), sum
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Gauge:
+    """
+    Gauge whose samples are read from a callback at scrape time.
+    """
+    def __init__(self, name: str, documentation: str, collect, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    labelnames=("method", "route", "status"),
+))
+REQUEST_DB_QUERIES = registry.register(Histogram(
+    "http_request_db_queries",
+    "Number of SQL statements executed per HTTP request.",
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+    labelnames=("method", "route"),
+))
+REQUEST_DB_DURATION = registry.register(Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent executing SQL per HTTP request.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    labelnames=("method", "route"),
+))
+REQUEST_ERRORS = registry.register(Counter(
+    "http_request_errors_total",
+    "HTTP requests answered with a 5xx status or an unhandled exception.",
+    labelnames=("method", "route", "status"),
+))
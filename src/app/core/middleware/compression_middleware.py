@@ -0,0 +1,85 @@
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.compression import (
+    StreamCompressor, add_vary_accept_encoding, compress_async, is_compressible, negotiate_encoding, weak_etag,
+)
+from app.core.config import settings
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware that compresses JSON, NDJSON and text responses with the
+    coding negotiated from `Accept-Encoding` (brotli when installed, else gzip).
+
+    Complete bodies smaller than COMPRESSION_MIN_SIZE are sent as is; streamed bodies
+    are compressed chunk by chunk. Responses that already carry a Content-Encoding,
+    like the gzipped export or precompressed ExtensionResponse bodies, pass through.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.compression_min_size if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        start_message: Optional[Message] = None
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether the body is streamed
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is not None:
+                chunk = await compressor.compress(body)
+                if not more_body:
+                    chunk += compressor.finish()
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            headers = MutableHeaders(scope=start_message)
+            if (
+                "content-encoding" in headers
+                or start_message["status"] in (204, 304)
+                or not is_compressible(headers.get("content-type"))
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            add_vary_accept_encoding(headers)
+            if encoding is None or (not more_body and len(body) < self.minimum_size):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            if "etag" in headers:
+                headers["ETag"] = weak_etag(headers["etag"])
+            if more_body:
+                del headers["content-length"]
+                compressor = StreamCompressor(encoding)
+                body = await compressor.compress(body)
+            else:
+                body = await compress_async(body, encoding)
+                headers["Content-Length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,52 @@
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import (
+    REQUEST_DB_DURATION, REQUEST_DB_QUERIES, REQUEST_DURATION, REQUEST_ERRORS,
+    RequestTimings, request_timings_var,
+)
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that collects per-request timings (SQL, validation,
+    rendering), reports them in a `Server-Timing` header and records them in the
+    Prometheus histograms served at /metrics.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings_var.set(timings)
+        start_time = time.perf_counter_ns()
+        status_code = 500
+
+        async def send_with_server_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.server_timing(time.perf_counter_ns() - start_time))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            request_timings_var.reset(token)
+            self._record(scope, status_code, timings, time.perf_counter_ns() - start_time)
+
+    @staticmethod
+    def _record(scope: Scope, status_code: int, timings: RequestTimings, elapsed_ns: int) -> None:
+        method = scope["method"]
+        # Label by route template, never by raw path, to keep label cardinality bounded
+        route = getattr(scope.get("route"), "path", "unmatched")
+        status = str(status_code)
+        REQUEST_DURATION.observe(elapsed_ns / 1e9, method, route, status)
+        REQUEST_DB_QUERIES.observe(timings.db_queries, method, route)
+        REQUEST_DB_DURATION.observe(timings.db_ns / 1e9, method, route)
+        if status_code >= 500:
+            REQUEST_ERRORS.inc(method, route, status)
@@ -1,41 +1,96 @@
+import re
 import time
 import uuid
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.core.logging.logger import trace_id_var, logger
-
-class TraceMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Generate a new unique Trace ID for the incoming request
-        trace_id = str(uuid.uuid4())
-        
-        # Set the trace_id in the context variable
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Optional
+from app.core.logging.logger import trace_id_var, logger, access_logger
+from app.core.profiling import RequestProfiler, request_profiler
+
+TRACE_HEADER = "X-Trace-ID"
+
+# Incoming trace ids are echoed back in headers and logs, so only accept sane tokens
+_VALID_TRACE_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+class TraceMiddleware:
+    """
+    Pure ASGI middleware that assigns a trace id to each HTTP request and reports
+    the processing time in the `X-Trace-ID` and `X-Process-Time` response headers.
+
+    An incoming `X-Trace-ID` header is propagated instead of generating a new id.
+    Response messages are forwarded as they are produced, so streaming bodies pass
+    through untouched.
+
+    Requests selected by the profiler are profiled end to end, including streamed
+    bodies; the profile is saved under the trace id, which `X-Profile` echoes.
+    """
+    def __init__(self, app: ASGIApp, header_name: str = TRACE_HEADER, profiler: Optional[RequestProfiler] = request_profiler):
+        self.app = app
+        self.header_name = header_name
+        self._header_key = header_name.lower().encode("latin-1")
+        self.profiler = profiler if profiler is not None and profiler.enabled else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = self._incoming_trace_id(scope) or str(uuid.uuid4())
         token = trace_id_var.set(trace_id)
-        
-        # Record start time
-        start_time = time.time()
-        
-        logger.info(f"Incoming Request: {request.method} {request.url.path}")
-        
+        start_time = time.perf_counter_ns()
+        method = scope["method"]
+        path = scope["path"]
+        status_code = 500
+        profile = self.profiler.start(scope) if self.profiler is not None else None
+
+        access_logger.info("Incoming Request: %s %s", method, path)
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Time until the response starts; for streaming bodies this is time to first byte
+                process_time = (time.perf_counter_ns() - start_time) / 1e9
+                headers = MutableHeaders(scope=message)
+                headers.append(self.header_name, trace_id)
+                headers.append("X-Process-Time", f"{process_time:.4f}s")
+                if profile is not None:
+                    headers.append("X-Profile", trace_id)
+            await send(message)
+
         try:
-            # Process the request
-            response = await call_next(request)
-            
-            # Calculate process time
-            process_time = time.time() - start_time
-            
-            # Add headers to the response
-            response.headers["X-Trace-ID"] = trace_id
-            response.headers["X-Process-Time"] = f"{process_time:.4f}s"
-            
-            logger.info(f"Request Completed: {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.4f}s")
-            return response
-            
+            await self.app(scope, receive, send_with_headers)
         except Exception as e:
             # Log unhandled exceptions at the middleware level
-            process_time = time.time() - start_time
-            logger.error(f"Unhandled Exception on {request.method} {request.url.path} - Time: {process_time:.4f}s - Error: {str(e)}", exc_info=True)
+            process_time = (time.perf_counter_ns() - start_time) / 1e9
+            logger.error(
+                "Unhandled Exception on %s %s - Time: %.4fs - Error: %s",
+                method, path, process_time, e, exc_info=True
+            )
             raise
+        else:
+            process_time = (time.perf_counter_ns() - start_time) / 1e9
+            access_logger.info(
+                "Request Completed: %s %s - Status: %d - Time: %.4fs",
+                method, path, status_code, process_time
+            )
         finally:
+            if profile is not None:
+                await self._save_profile(profile, trace_id, method, path)
             # Reset the context variable
             trace_id_var.reset(token)
+
+    async def _save_profile(self, profile, trace_id: str, method: str, path: str) -> None:
+        try:
+            profile_path = await self.profiler.finish(profile, trace_id)
+        except OSError as e:
+            logger.warning("Could not write the profile of %s %s: %s", method, path, e)
+        else:
+            logger.info("Profile of %s %s written to %s", method, path, profile_path)
+
+    def _incoming_trace_id(self, scope: Scope):
+        for key, value in scope["headers"]:
+            if key == self._header_key:
+                candidate = value.decode("latin-1")
+                return candidate if _VALID_TRACE_ID.match(candidate) else None
+        return None
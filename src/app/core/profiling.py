@@ -0,0 +1,74 @@
+import asyncio
+import cProfile
+import hmac
+import os
+import random
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.types import Scope
+from app.core.config import settings
+
+PROFILE_HEADER = "X-Profile"
+
+class RequestProfiler:
+    """
+    Captures a cProfile call profile of selected requests and writes it to
+    `<directory>/<trace id>.prof`, readable with `python -m pstats` or snakeviz.
+
+    A request is profiled when it sends `X-Profile: <token>` with the configured
+    token (the header is ignored while no token is set), or at random with
+    `sample_rate`. cProfile hooks the whole event loop thread, so one request is
+    profiled at a time and work done concurrently for other requests shows up in
+    it too; SQL runs on the driver's thread and is not in it (see the slow query log).
+    """
+    def __init__(self, directory: str, sample_rate: float = 0.0, token: str = ""):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self._active = False
+        self.profiled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def _wanted(self, scope: Scope) -> bool:
+        if self.token:
+            requested = Headers(scope=scope).get(PROFILE_HEADER)
+            if requested is not None and hmac.compare_digest(requested.encode(), self.token.encode()):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, scope: Scope) -> Optional[cProfile.Profile]:
+        """
+        Starts profiling the request if it is selected and no other one is being
+        profiled. Returns the running profile, to be handed to finish().
+        """
+        if self._active or not self._wanted(scope):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already attached to the process (Python 3.12+)
+            return None
+        self._active = True
+        return profile
+
+    async def finish(self, profile: cProfile.Profile, trace_id: str) -> str:
+        """
+        Stops `profile` and writes it on a worker thread. Returns the file path.
+        """
+        profile.disable()
+        self._active = False
+        self.profiled += 1
+        path = os.path.join(self.directory, f"{trace_id}.prof")
+        await asyncio.to_thread(self._dump, profile, path)
+        return path
+
+    def _dump(self, profile: cProfile.Profile, path: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(path)
+
+# Shared by every request; trace ids are checked by TraceMiddleware, so they are safe file names
+request_profiler = RequestProfiler(settings.profile_dir, settings.profile_sample_rate, settings.profile_token)
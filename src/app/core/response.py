@@ -1,11 +1,106 @@
-from typing import Any, Optional
-from pydantic import BaseModel
+from typing import Any, Dict, Mapping, Optional
+from pydantic import BaseModel, PrivateAttr
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from app.core.compression import add_vary_accept_encoding, compress_async, negotiate_encoding, weak_etag
+from app.core.config import settings
+from app.core.metrics import timed
 
 class ResponseExtension(BaseModel):
     status_code: int
     message: Optional[str] = None
     data: Optional[Any] = None
 
+    # Encoded JSON body, memoized by render()
+    _json: Optional[bytes] = PrivateAttr(default=None)
+    # Compressed variants of the body by content coding, memoized by compressed()
+    _compressed: Dict[str, bytes] = PrivateAttr(default_factory=dict)
+
     @classmethod
     def response(cls, status_code: int, data: Any = None, message: str = None):
         return cls(status_code=status_code, data=data, message=message)
+
+    def render(self) -> bytes:
+        """
+        Encodes the envelope and its nested models to JSON bytes in a single pass with
+        Pydantic's compiled serializer. The result is memoized, so an instance kept in a
+        cache is only encoded once; such instances must not be mutated afterwards.
+        """
+        if self._json is None:
+            with timed("render"):
+                self._json = self.__pydantic_serializer__.to_json(self)
+        return self._json
+
+    async def compressed(self, encoding: str) -> bytes:
+        """
+        The rendered body compressed with `encoding`. Memoized like render(), so a
+        cached instance is compressed once per coding instead of on every hit.
+        """
+        body = self._compressed.get(encoding)
+        if body is None:
+            body = await compress_async(self.render(), encoding)
+            self._compressed[encoding] = body
+        return body
+
+    def with_rendered_data(self, data_json: bytes) -> "ResponseExtension":
+        """
+        Sets the body from `data_json`, the already encoded `data`, so only the
+        envelope is encoded. `data` must be the last field of the envelope.
+        """
+        head = self.__pydantic_serializer__.to_json(self, exclude={"data"})
+        self._json = head[:-1] + b',"data":' + data_json + b"}"
+        return self
+
+class PaginatedResponseExtension(ResponseExtension):
+    """
+    Response envelope for keyset-paginated listings. `next_cursor` is the value
+    to send back as `after` to fetch the following page, or None on the last page.
+    """
+    next_cursor: Optional[str] = None
+
+    @classmethod
+    def page(cls, status_code: int, data: Any = None, next_cursor: str = None, message: str = None):
+        return cls(status_code=status_code, data=data, next_cursor=next_cursor, message=message)
+
+class ExtensionResponse(Response):
+    """
+    JSON response for a ResponseExtension. Unlike JSONResponse it never builds an
+    intermediate dict nor re-encodes with the stdlib json module.
+
+    Bodies of at least COMPRESSION_MIN_SIZE bytes are sent compressed with the coding
+    negotiated from the request's Accept-Encoding, using the envelope's memoized
+    compressed bytes; CompressionMiddleware then leaves them alone.
+    """
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: ResponseExtension,
+        status_code: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        self.extension = content
+        super().__init__(
+            content=content,
+            status_code=content.status_code if status_code is None else status_code,
+            headers=headers,
+            background=background,
+        )
+
+    def render(self, content: ResponseExtension) -> bytes:
+        return content.render()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.status_code not in (204, 304) and "content-encoding" not in self.headers:
+            add_vary_accept_encoding(self.headers)
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+            if encoding is not None and len(self.body) >= settings.compression_min_size:
+                self.body = await self.extension.compressed(encoding)
+                self.headers["Content-Encoding"] = encoding
+                self.headers["Content-Length"] = str(len(self.body))
+                if "etag" in self.headers:
+                    self.headers["ETag"] = weak_etag(self.headers["etag"])
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller starts the
+    computation and every caller that arrives while it is in flight awaits the same
+    result, or the same exception. Nothing is kept once the call completes.
+
+    The computation runs in its own task, so a cancelled caller does not cancel it
+    for the others; it is only cancelled when every caller has gone away.
+    Not thread-safe: it is meant to be used from the event loop only.
+    """
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda task: self._done(key, call))
+            self._calls[key] = call
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Callers arriving while it winds down start a new computation instead of joining it
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def forget(self, key: Hashable) -> None:
+        """
+        Makes later calls for `key` start a new computation instead of joining the one
+        in flight, e.g. after a write made its result stale. Current waiters still get it.
+        """
+        self._calls.pop(key, None)
+
+    def forget_all(self) -> None:
+        self._calls.clear()
+
+    def _done(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled() and call.task.exception() is not None:
+            # Retrieving the exception also keeps asyncio from reporting it as unhandled
+            self.errors += 1
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
@@ -0,0 +1,145 @@
+"""
+Coordination between the worker processes that serve one file-backed database
+(uvicorn or gunicorn with several workers): a startup lock so a single worker
+creates the schema and seeds the catalog, and a shared change counter that lets
+each worker drop the in-process cache entries of keys written by another.
+
+Both rely on POSIX advisory file locks; without fcntl (Windows) the app runs
+as a single worker.
+"""
+import asyncio
+import mmap
+import os
+import struct
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable, List, Optional
+from sqlalchemy.engine import make_url
+from app.core.config import Settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_COUNTER = struct.Struct("<Q")
+# Each change is also written to a ring of fixed-size slots: the length of the
+# changed key (0 when everything changed) followed by its UTF-8 bytes.
+_MAX_KEY_LENGTH = 62
+_SLOT = struct.Struct(f"<H{_MAX_KEY_LENGTH}s")
+_RING_SLOTS = 256
+_FILE_SIZE = _COUNTER.size + _RING_SLOTS * _SLOT.size
+
+def database_path(config: Settings) -> Optional[str]:
+    """
+    Path of the SQLite database file, or None for an in-memory database.
+    """
+    database = make_url(config.database_url).database
+    if not database or database == ":memory:":
+        return None
+    return os.path.abspath(database)
+
+class SharedCounter:
+    """
+    A 64-bit change counter in a small memory-mapped file shared by every worker,
+    followed by a ring with the key of each of the last changes. Reading is a
+    memory access, so it can be checked on every cache lookup; increments take an
+    exclusive file lock.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < _FILE_SIZE:
+                os.ftruncate(self._fd, _FILE_SIZE)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, _FILE_SIZE)
+
+    @property
+    def value(self) -> int:
+        return _COUNTER.unpack_from(self._map)[0]
+
+    def increment(self, key: Optional[Hashable] = None) -> int:
+        """
+        Records a change of `key`, or of everything when it is None. Keys other than
+        short strings are recorded as a change of everything.
+        """
+        encoded = key.encode() if isinstance(key, str) else b""
+        if len(encoded) > _MAX_KEY_LENGTH:
+            encoded = b""
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            value = _COUNTER.unpack_from(self._map)[0] + 1
+            # The slot is written before the counter, so readers never see a change without its key
+            _SLOT.pack_into(self._map, self._slot_offset(value), len(encoded), encoded)
+            _COUNTER.pack_into(self._map, 0, value)
+            return value
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def changed_keys(self, since: int, until: int) -> Optional[List[str]]:
+        """
+        Keys changed after change `since` up to change `until`, or None when one of
+        them changed everything or the ring no longer holds them all.
+        """
+        if until - since > _RING_SLOTS:
+            return None
+        keys = []
+        for change in range(since + 1, until + 1):
+            length, encoded = _SLOT.unpack_from(self._map, self._slot_offset(change))
+            if length == 0:
+                return None
+            keys.append(encoded[:length].decode())
+        # Slots read while a writer was reusing them are not trusted
+        if self.value - since > _RING_SLOTS:
+            return None
+        return keys
+
+    def _slot_offset(self, change: int) -> int:
+        return _COUNTER.size + (change % _RING_SLOTS) * _SLOT.size
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+def shared_change_counter(config: Settings) -> Optional[SharedCounter]:
+    """
+    The change counter next to the database file, or None when the database is in
+    memory (a single process owns it) or file locks are not available.
+    """
+    path = database_path(config)
+    if path is None or fcntl is None:
+        return None
+    return SharedCounter(path + "-changes")
+
+def notify_workers(config: Settings) -> None:
+    """
+    Makes running workers drop their cached responses after the database was
+    changed from outside the app, e.g. by the importer.
+    """
+    counter = shared_change_counter(config)
+    if counter is not None:
+        counter.increment()
+        counter.close()
+
+@asynccontextmanager
+async def startup_lock(config: Settings) -> AsyncIterator[None]:
+    """
+    Held while a worker creates the schema and seeds or imports the catalog; the
+    other workers wait for it and then find the work already done.
+    """
+    path = database_path(config)
+    if path is None or fcntl is None:
+        yield
+        return
+    fd = os.open(path + "-startup.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # Blocking flock runs on a thread so the event loop of a waiting worker stays free
+        await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text
+from pydantic import ValidationError
+from sqlalchemy import DDL, Column, Integer, String, Float, ForeignKey, Index, Text, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.domain.schemas import CategorySchema, ProductDescriptionSchema, ProductSchema
 
 class Category(Base):
     __tablename__ = "categories"
@@ -8,7 +11,7 @@ class Category(Base):
     id = Column(String, primary_key=True, index=True)
     name = Column(String, nullable=False)
 
-    products = relationship("Product", back_populates="category")
+    products = relationship("Product", back_populates="category", primaryjoin="Category.id == foreign(Product.category_id)")
 
 class Product(Base):
     __tablename__ = "products"
@@ -20,16 +23,288 @@ class Product(Base):
     available_quantity = Column(Integer, default=0)
     thumbnail = Column(String)
     condition = Column(String)
-    category_id = Column(String, ForeignKey("categories.id"))
+    # Deliberately not a foreign key: SQLite enforces foreign keys, and products may
+    # reference a category that is created later (or never)
+    category_id = Column(String)
+    # Catalog version of the last write to this product; unique across re-creations
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
-    category = relationship("Category", back_populates="products")
-    description = relationship("ProductDescription", back_populates="product", uselist=False)
+    category = relationship("Category", back_populates="products", primaryjoin="foreign(Product.category_id) == Category.id")
+    # The database removes the description with its product (ON DELETE CASCADE), so
+    # deletes are a single statement and the ORM never loads the child to delete it
+    description = relationship(
+        "ProductDescription", back_populates="product", uselist=False,
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
+
+    # Storefront filters, each ending in the sort columns so filtered listings sorted
+    # by id or price and paginated by keyset are served straight from the index, in
+    # order. The in-stock flag is not selective enough for its own index and is
+    # checked on the rows of whichever index is used.
+    __table_args__ = (
+        Index("ix_products_category", "category_id", "id"),
+        Index("ix_products_category_price", "category_id", "price", "id"),
+        Index("ix_products_category_condition_price", "category_id", "condition", "price", "id"),
+        Index("ix_products_condition_id", "condition", "id"),
+        Index("ix_products_condition_price", "condition", "price", "id"),
+        Index("ix_products_price", "price", "id"),
+    )
 
 class ProductDescription(Base):
     __tablename__ = "product_descriptions"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(String, ForeignKey("products.id"))
+    # A product has at most one description
+    product_id = Column(String, ForeignKey("products.id", ondelete="CASCADE"), index=True, unique=True)
     text = Column(Text)
 
     product = relationship("Product", back_populates="description")
+
+class CatalogState(Base):
+    """
+    Single-row table holding a counter bumped by every catalog write. It versions
+    the collection as a whole and hands out per-product versions.
+    """
+    __tablename__ = "catalog_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+CATALOG_STATE_ID = 1
+
+event.listen(
+    CatalogState.__table__,
+    "after_create",
+    DDL(f"INSERT INTO catalog_state (id, version) VALUES ({CATALOG_STATE_ID}, 0)"),
+)
+
+class ProductDetail(Base):
+    """
+    Read model of the product detail: the ProductSchema JSON of each product, already
+    rendered. It is maintained by triggers in the same transaction as every write to
+    products, descriptions and categories, so a detail read is one primary-key lookup.
+    """
+    __tablename__ = "product_details"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    product_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)
+
+def render_detail_payload(
+    product_id, title, price, currency_id, available_quantity, thumbnail, condition, category_id,
+    category_row_id, category_name, description_row_id, description_text,
+) -> str:
+    """
+    ProductSchema JSON of one product, byte for byte what the listing and the other
+    detail paths render. SQLite's own JSON functions write REAL values with 15
+    significant digits, which would serve a different price under the same ETag.
+    """
+    fields = {
+        "id": product_id, "title": title, "price": price, "currency_id": currency_id,
+        "available_quantity": available_quantity, "thumbnail": thumbnail,
+        "condition": condition, "category_id": category_id,
+    }
+    category = None if category_row_id is None else {"id": category_row_id, "name": category_name}
+    description = None if description_row_id is None else {"text": description_text}
+    try:
+        return ProductSchema.model_validate({**fields, "category": category, "description": description}).model_dump_json()
+    except ValidationError:
+        # Rows the schema rejects (e.g. a NULL column) are stored as they are, nulls included
+        return ProductSchema.model_construct(
+            **fields,
+            category=None if category is None else CategorySchema.model_construct(**category),
+            description=None if description is None else ProductDescriptionSchema.model_construct(**description),
+        ).model_dump_json(warnings=False)
+
+@event.listens_for(Engine, "connect")
+def register_detail_renderer(dbapi_connection, connection_record):
+    # Every engine, including the ones tests and the CLIs build, runs the read model triggers
+    create_function = getattr(dbapi_connection, "create_function", None)
+    if create_function is not None:
+        create_function("render_detail_payload", 12, render_detail_payload, deterministic=True)
+
+# Renders the ProductSchema JSON of the products matched by a WHERE clause appended to it
+DETAIL_RENDER_SQL = """SELECT p.id, p.version, render_detail_payload(
+        p.id, p.title, p.price, p.currency_id, p.available_quantity, p.thumbnail,
+        p.condition, p.category_id, c.id, c.name, d.id, d.text
+    )
+    FROM products p
+    LEFT JOIN categories c ON c.id = p.category_id
+    LEFT JOIN product_descriptions d ON d.product_id = p.id"""
+
+def _render_details(where: str) -> str:
+    return (
+        f"INSERT INTO product_details (product_id, version, payload) {DETAIL_RENDER_SQL} WHERE {where} "
+        "ON CONFLICT (product_id) DO UPDATE SET version = excluded.version, payload = excluded.payload;"
+    )
+
+DETAIL_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS products_detail_insert AFTER INSERT ON products BEGIN
+        {_render_details("p.id = new.id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_detail_update AFTER UPDATE ON products BEGIN
+        {_render_details("p.id = new.id")}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_detail_delete AFTER DELETE ON products BEGIN
+        DELETE FROM product_details WHERE product_id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS descriptions_detail_insert AFTER INSERT ON product_descriptions BEGIN
+        {_render_details("p.id = new.product_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS descriptions_detail_update AFTER UPDATE ON product_descriptions BEGIN
+        {_render_details("p.id = new.product_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS descriptions_detail_delete AFTER DELETE ON product_descriptions BEGIN
+        {_render_details("p.id = old.product_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS categories_detail_insert AFTER INSERT ON categories BEGIN
+        {_render_details("p.category_id = new.id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS categories_detail_update AFTER UPDATE ON categories BEGIN
+        {_render_details("p.category_id = new.id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS categories_detail_delete AFTER DELETE ON categories BEGIN
+        {_render_details("p.category_id = old.id")}
+    END""",
+]
+
+# Backfills the read model, e.g. for a database created before it existed
+DETAIL_REBUILD_SQL = [
+    "DELETE FROM product_details",
+    f"INSERT INTO product_details (product_id, version, payload) {DETAIL_RENDER_SQL}",
+]
+
+for statement in DETAIL_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+class CategoryStats(Base):
+    """
+    Per-category aggregates of the products: counts, price bounds and the price sum
+    the average is derived from. Triggers adjust the row of the affected category on
+    every product insert, delete and change of price, stock or category, so reading
+    the stats of a category is one primary-key lookup whatever the catalog size.
+    Keyed by the products' category_id, which need not exist in categories.
+    """
+    __tablename__ = "category_stats"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    category_id = Column(String, primary_key=True)
+    product_count = Column(Integer, nullable=False)
+    in_stock_count = Column(Integer, nullable=False)
+    price_sum = Column(Float, nullable=False)
+    # Momentarily NULL while the last product of a category is removed, then the row goes
+    min_price = Column(Float)
+    max_price = Column(Float)
+
+    @property
+    def average_price(self) -> float:
+        return self.price_sum / self.product_count
+
+def _add_to_stats(row: str) -> str:
+    return f"""INSERT INTO category_stats (category_id, product_count, in_stock_count, price_sum, min_price, max_price)
+        SELECT {row}.category_id, 1, ifnull({row}.available_quantity, 0) > 0, {row}.price, {row}.price, {row}.price
+        WHERE {row}.category_id IS NOT NULL
+        ON CONFLICT (category_id) DO UPDATE SET
+            product_count = product_count + 1,
+            in_stock_count = in_stock_count + excluded.in_stock_count,
+            price_sum = price_sum + excluded.price_sum,
+            min_price = min(min_price, excluded.min_price),
+            max_price = max(max_price, excluded.max_price);"""
+
+def _remove_from_stats(row: str) -> str:
+    # A bound is only recomputed when the removed price was that bound; the lookup is
+    # one seek on ix_products_category_price. Emptied categories are dropped.
+    return f"""UPDATE category_stats SET
+            product_count = product_count - 1,
+            in_stock_count = in_stock_count - (ifnull({row}.available_quantity, 0) > 0),
+            price_sum = price_sum - {row}.price,
+            min_price = CASE WHEN {row}.price <= min_price
+                THEN (SELECT min(price) FROM products WHERE category_id = {row}.category_id) ELSE min_price END,
+            max_price = CASE WHEN {row}.price >= max_price
+                THEN (SELECT max(price) FROM products WHERE category_id = {row}.category_id) ELSE max_price END
+        WHERE category_id = {row}.category_id;
+        DELETE FROM category_stats WHERE category_id = {row}.category_id AND product_count <= 0;"""
+
+CATEGORY_STATS_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS products_stats_insert AFTER INSERT ON products
+        WHEN new.category_id IS NOT NULL BEGIN
+        {_add_to_stats("new")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_stats_delete AFTER DELETE ON products
+        WHEN old.category_id IS NOT NULL BEGIN
+        {_remove_from_stats("old")}
+    END""",
+    # Reservations only change the stock: adjust the in-stock count when it crosses zero
+    """CREATE TRIGGER IF NOT EXISTS products_stats_stock AFTER UPDATE OF available_quantity ON products
+        WHEN new.category_id IS NOT NULL AND new.category_id IS old.category_id AND new.price = old.price
+            AND (ifnull(new.available_quantity, 0) > 0) != (ifnull(old.available_quantity, 0) > 0) BEGIN
+        UPDATE category_stats
+        SET in_stock_count = in_stock_count + (ifnull(new.available_quantity, 0) > 0) - (ifnull(old.available_quantity, 0) > 0)
+        WHERE category_id = new.category_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_stats_move AFTER UPDATE OF price, category_id ON products
+        WHEN new.category_id IS NOT old.category_id OR new.price != old.price BEGIN
+        {_remove_from_stats("old")}
+        {_add_to_stats("new")}
+    END""",
+]
+
+# Backfills the aggregates, e.g. for a database created before they existed
+CATEGORY_STATS_REBUILD_SQL = [
+    "DELETE FROM category_stats",
+    """INSERT INTO category_stats (category_id, product_count, in_stock_count, price_sum, min_price, max_price)
+        SELECT category_id, count(*), sum(ifnull(available_quantity, 0) > 0), sum(price), min(price), max(price)
+        FROM products WHERE category_id IS NOT NULL GROUP BY category_id""",
+]
+
+for statement in CATEGORY_STATS_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+# Full-text index over product titles and descriptions. FTS5 rows share the rowid of
+# their product, and triggers keep the index in sync with every insert, update and
+# delete, including bulk statements that bypass the ORM.
+SEARCH_TABLE = "product_search"
+
+SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, description, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    # Title matches weigh ten times more than description matches
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description)
+        VALUES (new.rowid, new.title, (SELECT text FROM product_descriptions WHERE product_id = new.id));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_update AFTER UPDATE OF title ON products BEGIN
+        UPDATE {SEARCH_TABLE} SET title = new.title WHERE rowid = new.rowid;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.rowid;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS descriptions_search_insert AFTER INSERT ON product_descriptions BEGIN
+        UPDATE {SEARCH_TABLE} SET description = new.text
+        WHERE rowid = (SELECT rowid FROM products WHERE id = new.product_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS descriptions_search_update AFTER UPDATE OF text ON product_descriptions BEGIN
+        UPDATE {SEARCH_TABLE} SET description = new.text
+        WHERE rowid = (SELECT rowid FROM products WHERE id = new.product_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS descriptions_search_delete AFTER DELETE ON product_descriptions BEGIN
+        UPDATE {SEARCH_TABLE} SET description = NULL
+        WHERE rowid = (SELECT rowid FROM products WHERE id = old.product_id);
+    END""",
+]
+
+# Rebuilds the index from scratch, e.g. after a VACUUM, which may renumber the rowids
+# of tables without an INTEGER PRIMARY KEY
+SEARCH_REBUILD_SQL = [
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""INSERT INTO {SEARCH_TABLE}(rowid, title, description)
+        SELECT p.rowid, p.title, d.text FROM products p
+        LEFT JOIN product_descriptions d ON d.product_id = p.id""",
+]
+
+for statement in SEARCH_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Base.metadata, "before_drop", DDL(f"DROP TABLE IF EXISTS {SEARCH_TABLE}").execute_if(dialect="sqlite"))
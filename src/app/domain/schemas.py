@@ -1,11 +1,25 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, List
+from enum import Enum
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, Field, create_model
+from typing import FrozenSet, Optional, List, Type
 
 class CategorySchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: str
     name: str
 
+class CategoryStatsSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    product_count: int = 0
+    in_stock_count: int = 0
+    # None while the category has no products
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    average_price: Optional[float] = None
+
+class CategoryWithStatsSchema(CategorySchema):
+    stats: CategoryStatsSchema
+
 class ProductDescriptionSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     text: str
@@ -22,6 +36,39 @@ class ProductSchema(BaseModel):
     category_id: str
     category: Optional[CategorySchema] = None
     description: Optional[ProductDescriptionSchema] = None
+    # Used for the ETag only; not part of the payload
+    version: Optional[int] = Field(None, exclude=True)
+
+# Fields a client can select with `fields=`; `version` is internal
+PRODUCT_FIELDS = tuple(name for name in ProductSchema.model_fields if name != "version")
+
+def parse_product_fields(fields: Optional[str]) -> Optional[FrozenSet[str]]:
+    """
+    Parses a comma-separated `fields=` value. None means the full ProductSchema.
+    """
+    if fields is None:
+        return None
+    selected = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = selected.difference(PRODUCT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+    if not selected:
+        raise ValueError("At least one field must be selected.")
+    return selected
+
+@lru_cache(maxsize=None)
+def product_projection(fields: FrozenSet[str]) -> Type[BaseModel]:
+    """
+    Partial ProductSchema with only the selected fields, in the same order and with
+    the same types. `version` is kept (and still excluded) for the ETag. Built once
+    per combination of fields.
+    """
+    definitions = {
+        name: (info.annotation, info)
+        for name, info in ProductSchema.model_fields.items()
+        if name in fields or name == "version"
+    }
+    return create_model("ProductProjection", __config__=ConfigDict(from_attributes=True), **definitions)
 
 class ProductCreateSchema(BaseModel):
     id: str
@@ -34,3 +81,41 @@ class ProductCreateSchema(BaseModel):
     category_id: str
     description_text: Optional[str] = None
 
+class ProductDescriptionCreateSchema(BaseModel):
+    product_id: str
+    text: str
+
+class BatchItemResultSchema(BaseModel):
+    id: str
+    status_code: int
+    message: str
+
+class ReservationSchema(BaseModel):
+    quantity: int = Field(1, ge=1)
+
+class ReservationItemSchema(BaseModel):
+    product_id: str
+    quantity: int = Field(1, ge=1)
+
+class ReservationResultSchema(BaseModel):
+    id: str
+    status_code: int
+    message: str
+    available_quantity: Optional[int] = None
+
+class ProductSort(str, Enum):
+    ID = "id"
+    PRICE = "price"
+    PRICE_DESC = "-price"
+
+class ProductFilterSchema(BaseModel):
+    category_id: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    condition: Optional[str] = None
+    in_stock: Optional[bool] = None
+    sort: ProductSort = ProductSort.ID
+
+class ExportFormat(str, Enum):
+    JSONL = "jsonl"
+    CSV = "csv"
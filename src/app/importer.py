@@ -0,0 +1,56 @@
+"""
+Streams a catalog from CSV or JSONL files into the database set by DATABASE_URL.
+
+    python -m app.importer ./catalog
+    python -m app.importer --products products.jsonl --descriptions descriptions.csv --batch-size 10000
+
+A directory is searched for `categories`, `products` and `descriptions` files with
+a `.csv` or `.jsonl` extension, optionally gzipped. Rows that already exist are skipped.
+"""
+import argparse
+import asyncio
+import sys
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine, is_memory_database
+from app.core.workers import notify_workers
+from app.repositories.product_repository import ProductRepository
+from app.services.import_service import IMPORT_KINDS, CatalogImporter, find_catalog_files
+
+async def run(files, batch_size):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with SessionLocal() as db:
+            reports = await CatalogImporter(ProductRepository(), batch_size).import_files(db, files)
+        notify_workers(settings)
+        return reports
+    finally:
+        await engine.dispose()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", nargs="?", help="directory holding the catalog files")
+    for kind in IMPORT_KINDS:
+        parser.add_argument(f"--{kind}", metavar="PATH", help=f"{kind} file (.csv or .jsonl, optionally .gz)")
+    parser.add_argument("--batch-size", type=int, default=settings.import_batch_size, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    files = find_catalog_files(args.directory) if args.directory else {}
+    for kind in IMPORT_KINDS:
+        if getattr(args, kind):
+            files[kind] = getattr(args, kind)
+    if not files:
+        parser.error("no catalog files given")
+    if is_memory_database(settings.database_url):
+        print("warning: DATABASE_URL is an in-memory database; the import is lost when this process exits",
+              file=sys.stderr)
+
+    reports = asyncio.run(run(files, args.batch_size))
+    for report in reports:
+        print(report.summary())
+    rows = sum(report.rows for report in reports)
+    elapsed = sum(report.elapsed_seconds for report in reports)
+    print(f"total: {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,141 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.core.database import engine, Base, SessionLocal
-from app.controllers import product_controller
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.database import engine, Base, SessionLocal, is_memory_database
+from app.controllers import category_controller, product_controller
+from app.repositories.category_repository import CategoryRepository
+from app.repositories.product_repository import ProductRepository
+from app.services.import_service import CatalogImporter, find_catalog_files
+from app.services.product_service import product_detail_cache, product_detail_flight
 from app.domain.models import Category, Product, ProductDescription
+from app.core.metrics import Gauge, registry
+from app.core.middleware.compression_middleware import CompressionMiddleware
+from app.core.middleware.metrics_middleware import MetricsMiddleware
 from app.core.middleware.trace_middleware import TraceMiddleware
+from app.core.workers import startup_lock
+from sqlalchemy import select
+import logging
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Meli Product Detail & Model API")
-
-# Add Middlewares
-app.add_middleware(TraceMiddleware)
+logger = logging.getLogger(__name__)
 
 # Seed data function
-def seed_data():
-    db = SessionLocal()
-    # Check if data already exists
-    if db.query(Category).first():
-        db.close()
-        return
-
-    # Add Category
-    category = Category(id="MLB1051", name="Cellphones and Smartphones")
-    db.add(category)
+async def seed_data():
+    async with SessionLocal() as db:
+        # Check if data already exists
+        if await db.scalar(select(Category).limit(1)):
+            return
+
+        # Add Category
+        category = Category(id="MLB1051", name="Cellphones and Smartphones")
+        db.add(category)
     
-    # Add Product
-    product = Product(
-        id="MLB123456",
-        title="Samsung Galaxy S23 Ultra 512GB",
-        price=5499.00,
-        currency_id="BRL",
-        available_quantity=10,
-        thumbnail="http://http2.mlstatic.com/D_893123-MLB123456_O.jpg",
-        condition="new",
-        category_id="MLB1051"
-    )
-    db.add(product)
+        # Add Product
+        product = Product(
+            id="MLB123456",
+            title="Samsung Galaxy S23 Ultra 512GB",
+            price=5499.00,
+            currency_id="BRL",
+            available_quantity=10,
+            thumbnail="http://http2.mlstatic.com/D_893123-MLB123456_O.jpg",
+            condition="new",
+            category_id="MLB1051"
+        )
+        db.add(product)
     
-    # Add Description
-    description = ProductDescription(
-        product_id="MLB123456",
-        text="The Galaxy S23 Ultra is Samsung's ultimate smartphone, featuring a 200MP camera and Snapdragon 8 Gen 2 processor."
-    )
-    db.add(description)
+        # Add Description
+        description = ProductDescription(
+            product_id="MLB123456",
+            text="The Galaxy S23 Ultra is Samsung's ultimate smartphone, featuring a 200MP camera and Snapdragon 8 Gen 2 processor."
+        )
+        db.add(description)
     
-    db.commit()
-    db.close()
+        await db.commit()
+
+async def import_catalog(directory: str):
+    """
+    Pre-loads the catalog files found in `directory`, unless products already exist.
+    """
+    files = find_catalog_files(directory)
+    if not files:
+        raise FileNotFoundError(f"No catalog files found in {directory}")
+    repository = ProductRepository()
+    async with SessionLocal() as db:
+        if await repository.has_products(db):
+            return
+        importer = CatalogImporter(repository, settings.import_batch_size, detail_cache=product_detail_cache)
+        await importer.import_files(db, files)
+
+async def backfill_detail_projection():
+    """
+    Renders the product detail read model when it was added to an existing database.
+    """
+    repository = ProductRepository()
+    async with SessionLocal() as db:
+        if await repository.detail_projection_is_empty(db):
+            rendered = await repository.rebuild_detail_projection(db)
+            logger.info("Backfilled %d product detail payloads", rendered)
+
+async def backfill_category_stats():
+    """
+    Computes the category aggregates when they were added to an existing database.
+    """
+    repository = CategoryRepository()
+    async with SessionLocal() as db:
+        if await repository.stats_are_empty(db):
+            categories = await repository.rebuild_stats(db)
+            logger.info("Backfilled the stats of %d categories", categories)
 
-# Run seed on startup
-seed_data()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.workers > 1 and is_memory_database(settings.database_url):
+        logger.warning("WEB_CONCURRENCY=%d with an in-memory database: every worker has its own catalog", settings.workers)
+    # The async engine needs a running event loop, so schema creation and seeding
+    # happen on startup instead of at import time. With several workers on one
+    # database file, the first to take the lock does it and the others find it done.
+    async with startup_lock(settings):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await backfill_detail_projection()
+        await backfill_category_stats()
+        if settings.catalog_import_dir:
+            await import_catalog(settings.catalog_import_dir)
+        else:
+            await seed_data()
+    yield
+
+app = FastAPI(title="Meli Product Detail & Model API", lifespan=lifespan)
+
+# Add Middlewares (the last one added is the outermost)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TraceMiddleware)
+
+registry.register(Gauge(
+    "product_detail_cache",
+    "Product detail cache counters and size.",
+    lambda: [((key,), value) for key, value in product_detail_cache.stats().items() if value is not None],
+    labelnames=("stat",),
+))
+registry.register(Gauge(
+    "product_detail_single_flight",
+    "Product detail loads started, joined by concurrent callers, failed and in flight.",
+    lambda: [((key,), value) for key, value in product_detail_flight.stats().items()],
+    labelnames=("stat",),
+))
 
 # Include Routers
 app.include_router(product_controller.router)
+app.include_router(category_controller.router)
 
 @app.get("/health")
 async def health_check():
     return {"status": "UP", "message": "Meli API is running"}
+
+@app.get("/health/cache")
+async def cache_stats():
+    return {"product_detail": product_detail_cache.stats(), "product_detail_single_flight": product_detail_flight.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,57 @@
+"""
+Rebuilds the derived tables of the database set by DATABASE_URL.
+
+    python -m app.maintenance details      # pre-rendered product detail payloads
+    python -m app.maintenance categories   # per-category product aggregates
+    python -m app.maintenance search       # full-text search index
+
+All are kept up to date by triggers; a rebuild is only needed to backfill them,
+e.g. for a database created before they existed, or after a VACUUM for the search index.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from app.core.database import Base, SessionLocal, engine, is_memory_database
+from app.core.config import settings
+from app.core.workers import notify_workers
+from app.repositories.category_repository import CategoryRepository
+from app.repositories.product_repository import ProductRepository
+
+async def run(target: str) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with SessionLocal() as db:
+            repository = ProductRepository()
+            if target == "details":
+                rows = await repository.rebuild_detail_projection(db)
+            elif target == "categories":
+                rows = await CategoryRepository().rebuild_stats(db)
+            else:
+                await repository.rebuild_search_index(db)
+                rows = 0
+        notify_workers(settings)
+        return rows
+    finally:
+        await engine.dispose()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", choices=("details", "categories", "search"), help="table to rebuild")
+    args = parser.parse_args(argv)
+    if is_memory_database(settings.database_url):
+        print("warning: DATABASE_URL is an in-memory database; there is nothing to rebuild", file=sys.stderr)
+
+    start = time.perf_counter()
+    rows = asyncio.run(run(args.target))
+    elapsed = time.perf_counter() - start
+    if args.target == "details":
+        print(f"details: {rows} payloads rendered in {elapsed:.2f}s")
+    elif args.target == "categories":
+        print(f"categories: stats of {rows} categories computed in {elapsed:.2f}s")
+    else:
+        print(f"search: index rebuilt in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
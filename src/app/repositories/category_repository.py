@@ -0,0 +1,49 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.models import CATEGORY_STATS_REBUILD_SQL, Category, CategoryStats, Product
+
+class CategoryRepository:
+    async def get_all(self, db: AsyncSession, limit: int, after: Optional[str] = None) -> List[Tuple[Category, Optional[CategoryStats]]]:
+        """
+        A page of categories in id order, each with its aggregates (None when it has
+        no products), from one index-ordered join on primary keys.
+        """
+        stmt = (
+            select(Category, CategoryStats)
+            .outerjoin(CategoryStats, CategoryStats.category_id == Category.id)
+            .order_by(Category.id)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(Category.id > after)
+        return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+    async def get_stats(self, db: AsyncSession, category_id: str) -> Optional[CategoryStats]:
+        return await db.scalar(select(CategoryStats).where(CategoryStats.category_id == category_id))
+
+    async def exists(self, db: AsyncSession, category_id: str) -> bool:
+        return await db.scalar(select(Category.id).where(Category.id == category_id)) is not None
+
+    async def rebuild_stats(self, db: AsyncSession) -> int:
+        """
+        Recomputes the aggregates of every category with one GROUP BY over the
+        products. Returns how many categories have products.
+        """
+        try:
+            for statement in CATEGORY_STATS_REBUILD_SQL:
+                result = await db.execute(text(statement))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return result.rowcount
+
+    async def stats_are_empty(self, db: AsyncSession) -> bool:
+        """
+        True when products with a category exist but no aggregates do, i.e. the table
+        was added to an existing database and needs a backfill.
+        """
+        if await db.scalar(select(Product.id).where(Product.category_id.is_not(None)).limit(1)) is None:
+            return False
+        return await db.scalar(select(CategoryStats.category_id).limit(1)) is None
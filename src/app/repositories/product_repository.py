@@ -1,19 +1,252 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from app.domain.models import Product, ProductDescription
-from app.domain.schemas import ProductCreateSchema
+import re
+from typing import AsyncIterator, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple, Union
+from sqlalchemy import Select, case, delete, insert, select, text, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from app.domain.models import (
+    CatalogState, CATALOG_STATE_ID, Category, DETAIL_REBUILD_SQL, Product, ProductDescription, ProductDetail,
+    SEARCH_TABLE, SEARCH_REBUILD_SQL,
+)
+from app.domain.schemas import ProductCreateSchema, ProductFilterSchema, ProductSort
+
+# ProductSchema serializes both relationships, so they are always loaded up front
+# instead of issuing one lazy SELECT per relationship per product.
+# Lists use select-in loading (one extra query per relationship for the whole page);
+# single lookups use joined loading (everything in one round-trip).
+LIST_LOAD_OPTIONS = (selectinload(Product.category), selectinload(Product.description))
+DETAIL_LOAD_OPTIONS = (joinedload(Product.category), joinedload(Product.description))
+
+PRODUCT_RELATIONSHIPS = {"category": Product.category, "description": Product.description}
+
+def projection_options(fields: FrozenSet[str], loader=selectinload) -> Sequence:
+    """
+    Load options for a sparse fieldset: only the selected columns, plus the id, the
+    price (sort keys for the cursor) and the version (for the ETag), and only the
+    selected relationships, loaded with `loader`.
+    """
+    columns = [getattr(Product, name) for name in sorted(fields) if name not in PRODUCT_RELATIONSHIPS]
+    options = [load_only(Product.id, Product.price, Product.version, *columns)]
+    options.extend(loader(relationship) for name, relationship in PRODUCT_RELATIONSHIPS.items() if name in fields)
+    return tuple(options)
+
+# Flat export projection. The description is exported as `description_text`, so an
+# export can be loaded back with the catalog importer.
+EXPORT_COLUMNS = (
+    Product.id,
+    Product.title,
+    Product.price,
+    Product.currency_id,
+    Product.available_quantity,
+    Product.thumbnail,
+    Product.condition,
+    Product.category_id,
+    Category.name.label("category_name"),
+    ProductDescription.text.label("description_text"),
+)
+EXPORT_FIELDS = tuple(column.key for column in EXPORT_COLUMNS)
+
+# Products removed per transaction by delete_all
+DELETE_CHUNK_SIZE = 1000
+
+_SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def to_match_query(query: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 MATCH expression: every word must match, and the
+    last one is treated as a prefix so results show up while the user is typing.
+    Quoting each token keeps FTS5 operators in user input from being interpreted.
+    """
+    tokens = _SEARCH_TOKEN.findall(query)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
 
 class ProductRepository:
     def __init__(self):
         pass
 
-    async def get_all(self, db: Session) -> List[Product]:
-        return db.query(Product).all()
+    async def get_all(
+        self,
+        db: AsyncSession,
+        limit: Optional[int] = None,
+        after: Optional[Union[str, Tuple[float, str]]] = None,
+        filters: Optional[ProductFilterSchema] = None,
+        fields: Optional[FrozenSet[str]] = None,
+    ) -> List[Product]:
+        """
+        Returns products ordered by id, or by the sort key in `filters`. When `after`
+        is given, only products that sort after it are returned (keyset pagination),
+        so each page is an index range scan instead of an OFFSET that re-reads every
+        skipped row. `after` is an id, or a (price, id) pair when sorting by price.
+        With `fields`, only those columns and relationships are loaded.
+        """
+        options = LIST_LOAD_OPTIONS if fields is None else projection_options(fields)
+        stmt = self.list_statement(limit=limit, after=after, filters=filters).options(*options)
+        result = await db.scalars(stmt)
+        return list(result.all())
+
+    def list_statement(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[Union[str, Tuple[float, str]]] = None,
+        filters: Optional[ProductFilterSchema] = None,
+    ) -> Select:
+        """
+        Builds the listing query with every filter and the sort pushed down into SQL.
+        """
+        filters = filters or ProductFilterSchema()
+        stmt = self._filter(select(Product), filters)
+
+        if filters.sort == ProductSort.PRICE:
+            stmt = stmt.order_by(Product.price, Product.id)
+            if after is not None:
+                stmt = stmt.where(tuple_(Product.price, Product.id) > tuple_(*after))
+        elif filters.sort == ProductSort.PRICE_DESC:
+            stmt = stmt.order_by(Product.price.desc(), Product.id.desc())
+            if after is not None:
+                stmt = stmt.where(tuple_(Product.price, Product.id) < tuple_(*after))
+        else:
+            stmt = stmt.order_by(Product.id)
+            if after is not None:
+                stmt = stmt.where(Product.id > after)
+
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
+
+    @staticmethod
+    def _filter(stmt: Select, filters: ProductFilterSchema) -> Select:
+        if filters.category_id is not None:
+            stmt = stmt.where(Product.category_id == filters.category_id)
+        if filters.condition is not None:
+            stmt = stmt.where(Product.condition == filters.condition)
+        if filters.min_price is not None:
+            stmt = stmt.where(Product.price >= filters.min_price)
+        if filters.max_price is not None:
+            stmt = stmt.where(Product.price <= filters.max_price)
+        if filters.in_stock is True:
+            stmt = stmt.where(Product.available_quantity > 0)
+        elif filters.in_stock is False:
+            stmt = stmt.where(Product.available_quantity <= 0)
+        return stmt
+
+    async def stream_all(
+        self,
+        db: AsyncSession,
+        after: Optional[str] = None,
+        batch_size: int = 500,
+        filters: Optional[ProductFilterSchema] = None,
+        fields: Optional[FrozenSet[str]] = None,
+    ) -> AsyncIterator[Product]:
+        """
+        Yields products ordered by id from a server-side cursor, fetching `batch_size`
+        rows at a time so memory stays flat regardless of the catalog size.
+        Filters apply, but the sort key is ignored: streams are always in id order.
+        """
+        id_order = (filters or ProductFilterSchema()).model_copy(update={"sort": ProductSort.ID})
+        options = LIST_LOAD_OPTIONS if fields is None else projection_options(fields)
+        stmt = (
+            self.list_statement(after=after, filters=id_order)
+            .options(*options)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream_scalars(stmt)
+        async for product in result:
+            yield product
+
+    async def stream_export_rows(
+        self,
+        db: AsyncSession,
+        batch_size: int = 1000,
+        filters: Optional[ProductFilterSchema] = None,
+    ) -> AsyncIterator[tuple]:
+        """
+        Yields one plain tuple per product, with the fields of EXPORT_FIELDS, ordered by
+        id. Only columns are selected, so no ORM objects or identity map entries are
+        built, and rows come from a server-side cursor `batch_size` at a time.
+        """
+        stmt = (
+            select(*EXPORT_COLUMNS)
+            .outerjoin(Category, Category.id == Product.category_id)
+            .outerjoin(ProductDescription, ProductDescription.product_id == Product.id)
+            .order_by(Product.id)
+            .execution_options(yield_per=batch_size)
+        )
+        stmt = self._filter(stmt, filters or ProductFilterSchema())
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            for row in partition:
+                yield tuple(row)
     
-    async def get_product_with_details(self, db: Session, product_id: str) -> Optional[Product]:
-        return db.query(Product).filter(Product.id == product_id).first()
+    async def get_product_with_details(
+        self, db: AsyncSession, product_id: str, fields: Optional[FrozenSet[str]] = None
+    ) -> Optional[Product]:
+        options = DETAIL_LOAD_OPTIONS if fields is None else projection_options(fields, joinedload)
+        stmt = select(Product).options(*options).where(Product.id == product_id)
+        return await db.scalar(stmt)
         
-    async def create(self, db: Session, product_data: ProductCreateSchema) -> Product:
+    async def get_detail_payload(self, db: AsyncSession, product_id: str) -> Optional[Tuple[int, bytes]]:
+        """
+        Version and pre-rendered ProductSchema JSON of a product, from the read model:
+        one primary-key lookup, no joins. None when the product has no stored payload.
+        """
+        row = (await db.execute(
+            select(ProductDetail.version, ProductDetail.payload).where(ProductDetail.product_id == product_id)
+        )).first()
+        if row is None:
+            return None
+        return row.version, row.payload.encode()
+
+    async def rebuild_detail_projection(self, db: AsyncSession) -> int:
+        """
+        Re-renders the stored detail payload of every product in one transaction.
+        Returns how many were rendered.
+        """
+        try:
+            for statement in DETAIL_REBUILD_SQL:
+                result = await db.execute(text(statement))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return result.rowcount
+
+    async def detail_projection_is_empty(self, db: AsyncSession) -> bool:
+        """
+        True when products exist but none has a stored detail payload, i.e. the read
+        model was added to an existing database and needs a backfill.
+        """
+        if not await self.has_products(db):
+            return False
+        return await db.scalar(select(ProductDetail.product_id).limit(1)) is None
+
+    async def get_version(self, db: AsyncSession, product_id: str) -> Optional[int]:
+        """
+        Primary-key lookup of the product version alone, for conditional requests.
+        """
+        return await db.scalar(select(Product.version).where(Product.id == product_id))
+
+    async def get_catalog_version(self, db: AsyncSession) -> int:
+        return await db.scalar(select(CatalogState.version).where(CatalogState.id == CATALOG_STATE_ID))
+
+    async def _next_catalog_version(self, db: AsyncSession) -> int:
+        """
+        Bumps the catalog-wide change counter inside the caller's transaction and
+        returns the new value, to be stamped on the products written by it.
+        """
+        stmt = (
+            update(CatalogState)
+            .where(CatalogState.id == CATALOG_STATE_ID)
+            .values(version=CatalogState.version + 1)
+            .returning(CatalogState.version)
+        )
+        return (await db.execute(stmt)).scalar_one()
+
+    async def create(self, db: AsyncSession, product_data: ProductCreateSchema) -> Product:
+        version = await self._next_catalog_version(db)
         new_product = Product(
             id=product_data.id,
             title=product_data.title,
@@ -22,7 +255,8 @@ class ProductRepository:
             available_quantity=product_data.available_quantity,
             thumbnail=product_data.thumbnail,
             condition=product_data.condition,
-            category_id=product_data.category_id
+            category_id=product_data.category_id,
+            version=version
         )
         db.add(new_product)
         
@@ -30,22 +264,232 @@ class ProductRepository:
             description = ProductDescription(product_id=new_product.id, text=product_data.description_text)
             db.add(description)
             
-        db.commit()
-        db.refresh(new_product)
-        return new_product
+        await db.commit()
+        # Reload with relationships eagerly joined rather than refresh() plus two lazy loads
+        return await self.get_product_with_details(db, new_product.id)
         
-    async def delete_by_id(self, db: Session, product_id: str) -> bool:
-        product = await self.get_product_with_details(db, product_id)
-        if product:
-            # SQLAlchemy will cascade delete if configured, or we delete children explicitly
-            if product.description:
-                db.delete(product.description)
-            db.delete(product)
-            db.commit()
-            return True
-        return False
-        
-    async def delete_all(self, db: Session) -> None:
-        db.query(ProductDescription).delete()
-        db.query(Product).delete()
-        db.commit()
+    async def search(self, db: AsyncSession, query: str, limit: int, offset: int = 0) -> List[Product]:
+        """
+        Full-text search over titles and descriptions, best matches first (bm25).
+        The ranked page of ids comes from the FTS5 index; only those rows are loaded.
+        """
+        match = to_match_query(query)
+        if match is None:
+            return []
+        ranked = await db.execute(
+            text(
+                # Rank and cut the page inside the FTS index first, then join only those rows
+                f"SELECT p.id FROM (SELECT rowid, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+                f"ORDER BY rank LIMIT :limit OFFSET :offset) s JOIN products p ON p.rowid = s.rowid ORDER BY s.rank"
+            ),
+            {"match": match, "limit": limit, "offset": offset},
+        )
+        ids = list(ranked.scalars())
+        if not ids:
+            return []
+        result = await db.scalars(select(Product).options(*LIST_LOAD_OPTIONS).where(Product.id.in_(ids)))
+        by_id = {product.id: product for product in result.all()}
+        return [by_id[product_id] for product_id in ids if product_id in by_id]
+
+    async def rebuild_search_index(self, db: AsyncSession) -> None:
+        for statement in SEARCH_REBUILD_SQL:
+            await db.execute(text(statement))
+        await db.commit()
+
+    async def get_existing_ids(self, db: AsyncSession, product_ids: Iterable[str]) -> Set[str]:
+        """
+        Returns which of the given ids already exist, using a single IN query.
+        """
+        ids = list(product_ids)
+        if not ids:
+            return set()
+        result = await db.scalars(select(Product.id).where(Product.id.in_(ids)))
+        return set(result.all())
+
+    async def create_many(self, db: AsyncSession, products_data: List[ProductCreateSchema]) -> None:
+        """
+        Inserts products and their descriptions with executemany-style bulk INSERTs
+        in a single transaction. No objects are loaded back.
+        """
+        product_rows = [
+            {
+                "id": p.id,
+                "title": p.title,
+                "price": p.price,
+                "currency_id": p.currency_id,
+                "available_quantity": p.available_quantity,
+                "thumbnail": p.thumbnail,
+                "condition": p.condition,
+                "category_id": p.category_id,
+            }
+            for p in products_data
+        ]
+        description_rows = [
+            {"product_id": p.id, "text": p.description_text}
+            for p in products_data if p.description_text
+        ]
+        try:
+            if product_rows:
+                version = await self._next_catalog_version(db)
+                for row in product_rows:
+                    row["version"] = version
+                await db.execute(insert(Product), product_rows)
+            if description_rows:
+                await db.execute(insert(ProductDescription), description_rows)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+    async def reserve_many(self, db: AsyncSession, quantities: Dict[str, int]) -> Tuple[bool, Dict[str, Optional[int]]]:
+        """
+        Takes `quantities[id]` units of stock from every product, all or nothing, with
+        one conditional UPDATE that only matches rows with enough stock. No product is
+        loaded, so concurrent reservations can never oversell.
+        Returns whether the reservation went through, and the available quantity of each
+        product afterwards (None for a product that does not exist).
+        """
+        ids = sorted(quantities)
+        requested = case(quantities, value=Product.id)
+        try:
+            version = await self._next_catalog_version(db)
+            result = await db.execute(
+                update(Product)
+                .where(Product.id.in_(ids), Product.available_quantity >= requested)
+                .values(available_quantity=Product.available_quantity - requested, version=version)
+                .returning(Product.id, Product.available_quantity)
+                .execution_options(synchronize_session=False)
+            )
+            available = dict(result.all())
+            if len(available) == len(ids):
+                await db.commit()
+                return True, available
+            await db.rollback()
+        except Exception:
+            await db.rollback()
+            raise
+
+        result = await db.execute(select(Product.id, Product.available_quantity).where(Product.id.in_(ids)))
+        current = dict(result.all())
+        return False, {product_id: current.get(product_id) for product_id in ids}
+
+    async def import_batch(
+        self,
+        db: AsyncSession,
+        categories: List[dict],
+        products: List[dict],
+        descriptions: List[dict],
+    ) -> Tuple[int, int, int]:
+        """
+        Inserts one batch of imported rows with one executemany INSERT per table and
+        commits. Rows whose key already exists are skipped, so an import can be re-run.
+        Every batch bumps the catalog version, and the products whose detail it changes
+        (new descriptions, new categories) get the new version too.
+        Returns how many categories, products and descriptions were inserted.
+        """
+        inserted = []
+        try:
+            version = None
+            if categories or products or descriptions:
+                version = await self._next_catalog_version(db)
+                for row in products:
+                    row["version"] = version
+            new_category_ids = []
+            if categories:
+                category_ids = [row["id"] for row in categories]
+                existing = set(await db.scalars(select(Category.id).where(Category.id.in_(category_ids))))
+                new_category_ids = [category_id for category_id in category_ids if category_id not in existing]
+            described_ids = []
+            if descriptions:
+                product_ids = [row["product_id"] for row in descriptions]
+                existing = set(await db.scalars(
+                    select(ProductDescription.product_id).where(ProductDescription.product_id.in_(product_ids))
+                ))
+                described_ids = [product_id for product_id in product_ids if product_id not in existing]
+            for model, rows in ((Category, categories), (Product, products), (ProductDescription, descriptions)):
+                if not rows:
+                    inserted.append(0)
+                    continue
+                result = await db.execute(sqlite_insert(model.__table__).on_conflict_do_nothing(), rows)
+                inserted.append(result.rowcount)
+            if described_ids:
+                # A new description changes the detail payload, so its product gets a new version,
+                # whether the product is new in this batch or was imported before
+                await db.execute(
+                    update(Product)
+                    .where(Product.id.in_(described_ids))
+                    .values(version=version)
+                )
+            if new_category_ids:
+                # Products already filed under a new category now show its name
+                await db.execute(
+                    update(Product)
+                    .where(Product.category_id.in_(new_category_ids))
+                    .values(version=version)
+                )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return inserted[0], inserted[1], inserted[2]
+
+    async def has_products(self, db: AsyncSession) -> bool:
+        return await db.scalar(select(Product.id).limit(1)) is not None
+
+    async def delete_by_id(self, db: AsyncSession, product_id: str) -> bool:
+        """
+        Deletes a product with a single DELETE; its description goes with it through
+        ON DELETE CASCADE.
+        """
+        try:
+            result = await db.execute(delete(Product).where(Product.id == product_id))
+            deleted = result.rowcount > 0
+            if deleted:
+                await self._next_catalog_version(db)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return deleted
+
+    async def delete_many(self, db: AsyncSession, product_ids: Iterable[str]) -> Set[str]:
+        """
+        Deletes the given products with one DELETE ... RETURNING in a single
+        transaction and returns the ids that existed.
+        """
+        ids = list(product_ids)
+        if not ids:
+            return set()
+        try:
+            result = await db.execute(delete(Product).where(Product.id.in_(ids)).returning(Product.id))
+            deleted = set(result.scalars().all())
+            if deleted:
+                await self._next_catalog_version(db)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return deleted
+
+    async def delete_all(self, db: AsyncSession, chunk_size: int = DELETE_CHUNK_SIZE) -> int:
+        """
+        Deletes every product in chunks of `chunk_size`, committing after each one, so
+        the write lock is released between chunks and readers are not starved during
+        a large purge. Returns how many products were deleted.
+        """
+        total = 0
+        while True:
+            try:
+                result = await db.execute(
+                    delete(Product).where(Product.id.in_(select(Product.id).limit(chunk_size)))
+                )
+                # Every chunk is visible on its own, so each one that deleted rows is a catalog change
+                if result.rowcount:
+                    await self._next_catalog_version(db)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+            total += result.rowcount
+            if result.rowcount < chunk_size:
+                return total
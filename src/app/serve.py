@@ -0,0 +1,33 @@
+"""
+Runs the API under uvicorn with one or more worker processes.
+
+    DATABASE_URL=sqlite+aiosqlite:///./catalog.db python -m app.serve --workers 4
+
+Workers share the database file: the first one to start creates the schema and
+seeds or imports the catalog, and each clears its product detail cache when another
+one writes. An in-memory database cannot be shared, so it only runs one worker.
+"""
+import argparse
+import os
+import sys
+import uvicorn
+from app.core.config import settings
+from app.core.database import is_memory_database
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.workers, help="worker processes (default: WEB_CONCURRENCY or 1)")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and is_memory_database(settings.database_url):
+        parser.error("several workers need a file database: set DATABASE_URL, e.g. sqlite+aiosqlite:///./catalog.db")
+    if args.workers > 1 and sys.platform == "win32":
+        parser.error("several workers need POSIX file locks, which are not available on Windows")
+
+    # Workers read their settings from the environment, e.g. to pick their own log file
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import logging
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.repositories.category_repository import CategoryRepository
+from app.core.metrics import timed
+from app.core.response import ResponseExtension, PaginatedResponseExtension
+from app.domain.models import CategoryStats
+from app.domain.schemas import CategoryStatsSchema, CategoryWithStatsSchema
+
+logger = logging.getLogger(__name__)
+
+def to_stats_schema(stats: Optional[CategoryStats]) -> CategoryStatsSchema:
+    # A category without products has no aggregates row
+    return CategoryStatsSchema() if stats is None else CategoryStatsSchema.model_validate(stats)
+
+class CategoryService:
+    def __init__(self, repository: CategoryRepository):
+        self.repository = repository
+
+    async def get_categories(self, db: AsyncSession, limit: int = 100, after: Optional[str] = None) -> ResponseExtension:
+        try:
+            # Fetch one extra row to know whether another page exists without a COUNT query
+            rows = await self.repository.get_all(db, limit=limit + 1, after=after)
+            has_more = len(rows) > limit
+            with timed("validate"):
+                data = [
+                    CategoryWithStatsSchema(id=category.id, name=category.name, stats=to_stats_schema(stats))
+                    for category, stats in rows[:limit]
+                ]
+            next_cursor = data[-1].id if has_more else None
+            return PaginatedResponseExtension.page(status_code=200, data=data, next_cursor=next_cursor)
+        except Exception as ex:
+            logger.error(f"Error in CategoryService - get_categories: {str(ex)}")
+            return ResponseExtension.response(status_code=500, message="An internal error occurred.")
+
+    async def get_category_stats(self, db: AsyncSession, category_id: str) -> ResponseExtension:
+        """
+        Aggregates of a category, read from the trigger-maintained stats table. A
+        category with products but no row in categories still has stats.
+        """
+        try:
+            stats = await self.repository.get_stats(db, category_id)
+            if stats is None and not await self.repository.exists(db, category_id):
+                return ResponseExtension.response(status_code=404, message="Category not found.")
+            return ResponseExtension.response(status_code=200, data=to_stats_schema(stats))
+        except Exception as ex:
+            logger.error(f"Error in CategoryService - get_category_stats: {str(ex)}")
+            return ResponseExtension.response(status_code=500, message="An internal error occurred.")
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import logging
+import zlib
+from typing import AsyncIterator, Iterable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.repositories.product_repository import EXPORT_FIELDS, ProductRepository
+from app.domain.schemas import ExportFormat, ProductFilterSchema
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.JSONL: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+}
+
+# Rows are encoded into chunks of about this size, so the response is not sent one
+# tiny write per row
+CHUNK_SIZE = 64 * 1024
+
+def jsonl_line(row: tuple) -> str:
+    return json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False, separators=(",", ":")) + "\n"
+
+class _CsvLines:
+    """
+    Formats one row at a time with the csv module, which only writes to files.
+    """
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def line(self, row: Iterable) -> str:
+        self.writer.writerow(row)
+        value = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return value
+
+class ExportService:
+    def __init__(self, repository: ProductRepository, batch_size: int = 1000):
+        self.repository = repository
+        self.batch_size = batch_size
+
+    async def export_products(
+        self,
+        db: AsyncSession,
+        export_format: ExportFormat,
+        filters: Optional[ProductFilterSchema] = None,
+        compress: bool = False,
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields the catalog as JSONL or CSV in chunks of about CHUNK_SIZE bytes,
+        optionally gzipped as it goes. Memory use is bounded by the cursor batch and
+        the chunk size, whatever the number of products.
+        """
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+        encode_line = _CsvLines().line if export_format == ExportFormat.CSV else jsonl_line
+        parts = []
+        size = 0
+
+        def flush() -> bytes:
+            nonlocal parts, size
+            data = "".join(parts).encode("utf-8")
+            parts, size = [], 0
+            return compressor.compress(data) if compressor else data
+
+        try:
+            if export_format == ExportFormat.CSV:
+                parts.append(encode_line(EXPORT_FIELDS))
+            async for row in self.repository.stream_export_rows(db, batch_size=self.batch_size, filters=filters):
+                line = encode_line(row)
+                parts.append(line)
+                size += len(line)
+                if size >= CHUNK_SIZE:
+                    chunk = flush()
+                    # The compressor keeps small inputs buffered until it has a block
+                    if chunk:
+                        yield chunk
+            chunk = flush()
+            if compressor:
+                chunk += compressor.flush()
+            if chunk:
+                yield chunk
+        except Exception as ex:
+            # Headers are already sent at this point, so the stream is just cut short
+            logger.error(f"Error in ExportService - export_products: {str(ex)}")
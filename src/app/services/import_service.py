@@ -0,0 +1,163 @@
+import csv
+import gzip
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, TextIO
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import LRUCache
+from app.repositories.product_repository import ProductRepository
+from app.domain.schemas import CategorySchema, ProductCreateSchema, ProductDescriptionCreateSchema
+
+logger = logging.getLogger(__name__)
+
+# Imported in this order, so categories exist before the products that use them
+IMPORT_KINDS = ("categories", "products", "descriptions")
+IMPORT_FORMATS = (".csv", ".jsonl", ".csv.gz", ".jsonl.gz")
+
+ROW_SCHEMAS = {
+    "categories": CategorySchema,
+    "products": ProductCreateSchema,
+    "descriptions": ProductDescriptionCreateSchema,
+}
+
+@dataclass
+class ImportReport:
+    kind: str
+    path: str
+    rows: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def skipped(self) -> int:
+        # Valid rows whose key was already in the database
+        return self.rows - self.rejected - self.inserted
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.kind}: {self.rows} rows from {self.path} in {self.elapsed_seconds:.2f}s "
+            f"({self.rows_per_second:,.0f} rows/s) - {self.inserted} inserted, "
+            f"{self.skipped} already present, {self.rejected} rejected"
+        )
+
+def find_catalog_files(directory: str) -> Dict[str, str]:
+    """
+    Looks for `categories`, `products` and `descriptions` files in CSV or JSONL
+    format (optionally gzipped) in a directory.
+    """
+    files = {}
+    for kind in IMPORT_KINDS:
+        for extension in IMPORT_FORMATS:
+            path = os.path.join(directory, kind + extension)
+            if os.path.isfile(path):
+                files[kind] = path
+                break
+    return files
+
+def _open_text(path: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def read_rows(path: str) -> Iterator[tuple]:
+    """
+    Yields `(line_number, row)` one at a time, so memory use does not depend on the
+    file size. Empty CSV cells are left out so the schema defaults apply; a JSONL
+    line that is not valid JSON is yielded as `None`.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    with _open_text(path) as file:
+        if name.endswith(".csv"):
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)}
+        elif name.endswith(".jsonl"):
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError:
+                    yield line_number, None
+        else:
+            raise ValueError(f"Unsupported import format: {path}")
+
+class CatalogImporter:
+    """
+    Streams categories, products and descriptions from files into the database,
+    committing every `batch_size` rows.
+    """
+    def __init__(self, repository: ProductRepository, batch_size: int = 5000, detail_cache: Optional[LRUCache] = None):
+        self.repository = repository
+        self.batch_size = max(1, batch_size)
+        self.detail_cache = detail_cache
+
+    async def import_files(self, db: AsyncSession, files: Dict[str, str]) -> List[ImportReport]:
+        reports = []
+        for kind in IMPORT_KINDS:
+            if kind in files:
+                reports.append(await self.import_file(db, kind, files[kind]))
+        return reports
+
+    async def import_file(self, db: AsyncSession, kind: str, path: str) -> ImportReport:
+        if kind not in ROW_SCHEMAS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        schema = ROW_SCHEMAS[kind]
+        report = ImportReport(kind=kind, path=path)
+        start = time.perf_counter()
+        batch = []
+        for line_number, raw in read_rows(path):
+            report.rows += 1
+            try:
+                if not isinstance(raw, dict):
+                    raise ValueError("not a JSON object")
+                batch.append(schema.model_validate(raw))
+            except (ValidationError, ValueError) as ex:
+                report.rejected += 1
+                logger.warning("Rejected %s row at %s:%d: %s", kind, path, line_number, ex)
+                continue
+            if len(batch) >= self.batch_size:
+                await self._write_batch(db, kind, batch, report)
+                batch = []
+                logger.debug("Imported %d %s rows so far (%.0f rows/s)",
+                             report.rows, kind, report.rows / (time.perf_counter() - start))
+        if batch:
+            await self._write_batch(db, kind, batch, report)
+        report.elapsed_seconds = time.perf_counter() - start
+
+        if self.detail_cache is not None:
+            self.detail_cache.clear()
+        logger.info("Imported %s", report.summary())
+        return report
+
+    async def _write_batch(self, db: AsyncSession, kind: str, batch: list, report: ImportReport) -> None:
+        categories, products, descriptions = [], [], []
+        if kind == "categories":
+            categories = [row.model_dump() for row in batch]
+        elif kind == "descriptions":
+            # Foreign keys are enforced, so a description of an unknown product would
+            # fail the whole batch
+            existing = await self.repository.get_existing_ids(db, (row.product_id for row in batch))
+            for row in batch:
+                if row.product_id in existing:
+                    descriptions.append(row.model_dump())
+                else:
+                    report.rejected += 1
+                    logger.warning("Rejected description of unknown product %s in %s", row.product_id, report.path)
+        else:
+            for row in batch:
+                products.append(row.model_dump(exclude={"description_text"}))
+                # Product rows may carry their description inline
+                if row.description_text:
+                    descriptions.append({"product_id": row.id, "text": row.description_text})
+        inserted = await self.repository.import_batch(db, categories, products, descriptions)
+        report.inserted += inserted[IMPORT_KINDS.index(kind)]
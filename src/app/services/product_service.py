@@ -1,17 +1,95 @@
+import asyncio
+import base64
+import binascii
+import json
 import logging
-from typing import List
-from sqlalchemy.orm import Session
+from typing import AsyncIterator, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.product_repository import ProductRepository
-from app.core.response import ResponseExtension
-from app.domain.schemas import ProductSchema, ProductCreateSchema
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import SessionLocal, is_busy_error
+from app.core.singleflight import SingleFlight
+from app.core.workers import shared_change_counter
+from app.core.metrics import timed
+from app.core.response import ResponseExtension, PaginatedResponseExtension
+from app.domain.models import Product
+from app.domain.schemas import (
+    ProductSchema, ProductCreateSchema, BatchItemResultSchema, ProductFilterSchema, ProductSort,
+    ReservationItemSchema, ReservationResultSchema, product_projection,
+)
 
 logger = logging.getLogger(__name__)
 
+# Shared across requests: successful product detail responses keyed by product id.
+# Workers serving the same database file clear it when another one writes.
+product_detail_cache = LRUCache(
+    maxsize=settings.product_cache_size,
+    ttl=settings.product_cache_ttl_seconds,
+    shared_counter=shared_change_counter(settings),
+)
+# Shared across requests: product detail loads in flight, keyed by product id
+product_detail_flight = SingleFlight()
+# SQLite has a single writer. Queueing reservations here instead of on the database
+# lock avoids the busy handler's sleeps when many requests hit the same products.
+reservation_lock = asyncio.Lock()
+
+class InvalidCursorError(ValueError):
+    pass
+
+class StoredProductDetail:
+    """
+    `data` of a product detail served from the read model: the stored payload is
+    the body as is, and it is only parsed when a sparse fieldset needs the model.
+    """
+    __slots__ = ("version", "payload", "_model")
+
+    def __init__(self, version: int, payload: bytes):
+        self.version = version
+        self.payload = payload
+        self._model: Optional[ProductSchema] = None
+
+    def model(self) -> ProductSchema:
+        if self._model is None:
+            with timed("validate"):
+                self._model = ProductSchema.model_validate_json(self.payload)
+            self._model.version = self.version
+        return self._model
+
+def encode_cursor(product: Union[Product, ProductSchema], sort: ProductSort) -> str:
+    """
+    The id alone is the cursor for the default sort; price sorts need the (price, id)
+    pair, which is wrapped in an opaque URL-safe token.
+    """
+    if sort == ProductSort.ID:
+        return product.id
+    raw = json.dumps([product.price, product.id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], sort: ProductSort) -> Optional[Union[str, Tuple[float, str]]]:
+    if cursor is None or sort == ProductSort.ID:
+        return cursor
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        price, product_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(price), str(product_id)
+    except (binascii.Error, ValueError, TypeError) as ex:
+        raise InvalidCursorError(cursor) from ex
+
 class ProductService:
-    def __init__(self, repository: ProductRepository):
+    def __init__(
+        self,
+        repository: ProductRepository,
+        detail_cache: Optional[LRUCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        session_factory: Callable[[], AsyncSession] = SessionLocal,
+    ):
         self.repository = repository
+        self.detail_cache = detail_cache
+        self.single_flight = single_flight
+        self.session_factory = session_factory
 
-    async def create_product(self, db: Session, product_data: ProductCreateSchema) -> ResponseExtension:
+    async def create_product(self, db: AsyncSession, product_data: ProductCreateSchema) -> ResponseExtension:
         try:
             existing_product = await self.repository.get_product_with_details(db, product_data.id)
             if existing_product:
@@ -21,10 +99,13 @@ class ProductService:
                 )
             
             created_product = await self.repository.create(db, product_data)
+            self._invalidate_detail(product_data.id)
+            with timed("validate"):
+                created_data = ProductSchema.model_validate(created_product)
             
             return ResponseExtension.response(
                 status_code=201,
-                data=ProductSchema.model_validate(created_product),
+                data=created_data,
                 message="Product created successfully."
             )
         except Exception as ex:
@@ -34,27 +115,191 @@ class ProductService:
                 message="An internal error occurred while creating the product."
             )
 
-    async def get_all_products(self, db: Session) -> ResponseExtension:
+    async def create_products_batch(self, db: AsyncSession, products_data: List[ProductCreateSchema]) -> ResponseExtension:
         try:
-            products = await self.repository.get_all(db)
-            data = [ProductSchema.model_validate(i) for i in products]
-            return ResponseExtension.response(status_code=200, data=data)
+            existing_ids = await self.repository.get_existing_ids(db, (p.id for p in products_data))
+
+            results = []
+            to_create = []
+            seen_ids = set()
+            for product_data in products_data:
+                if product_data.id in existing_ids:
+                    results.append(BatchItemResultSchema(id=product_data.id, status_code=400, message="Product already exists."))
+                elif product_data.id in seen_ids:
+                    results.append(BatchItemResultSchema(id=product_data.id, status_code=400, message="Duplicate ID in batch."))
+                else:
+                    seen_ids.add(product_data.id)
+                    to_create.append(product_data)
+                    results.append(BatchItemResultSchema(id=product_data.id, status_code=201, message="Product created successfully."))
+
+            await self.repository.create_many(db, to_create)
+            for product_data in to_create:
+                self._invalidate_detail(product_data.id)
+
+            created = len(to_create)
+            return ResponseExtension.response(
+                # 207 Multi-Status when only part of the batch was created
+                status_code=201 if created == len(products_data) else 207,
+                data=results,
+                message=f"{created} of {len(products_data)} products created."
+            )
+        except Exception as ex:
+            logger.error(f"Error in ProductService - create_products_batch: {str(ex)}")
+            return ResponseExtension.response(
+                status_code=500,
+                message="An internal error occurred while creating the products."
+            )
+
+    async def get_all_products(
+        self,
+        db: AsyncSession,
+        limit: int = 100,
+        after: Optional[str] = None,
+        filters: Optional[ProductFilterSchema] = None,
+        fields: Optional[FrozenSet[str]] = None,
+    ) -> ResponseExtension:
+        filters = filters or ProductFilterSchema()
+        schema = ProductSchema if fields is None else product_projection(fields)
+        try:
+            after_key = decode_cursor(after, filters.sort)
+            # Fetch one extra row to know whether another page exists without a COUNT query
+            products = await self.repository.get_all(db, limit=limit + 1, after=after_key, filters=filters, fields=fields)
+            has_more = len(products) > limit
+            with timed("validate"):
+                data = [schema.model_validate(i) for i in products[:limit]]
+            # The sort keys are always loaded, even when they are not among the fields
+            next_cursor = encode_cursor(products[limit - 1], filters.sort) if has_more else None
+            return PaginatedResponseExtension.page(status_code=200, data=data, next_cursor=next_cursor)
+        except InvalidCursorError:
+            return ResponseExtension.response(status_code=400, message="Invalid cursor.")
         except Exception as ex:
             logger.error(f"Error in ProductService - get_all_products: {str(ex)}")
             return ResponseExtension.response(status_code=500, message="An internal error occurred.")
 
-    async def get_product_detail(self, db: Session, product_id: str) -> ResponseExtension:
+    async def search_products(self, db: AsyncSession, query: str, limit: int = 20, after: Optional[str] = None) -> ResponseExtension:
         try:
-            product = await self.repository.get_product_with_details(db, product_id)
-            
+            # Ranked results page by offset; the cursor is the offset of the next page
+            offset = int(after) if after else 0
+            products = await self.repository.search(db, query, limit=limit + 1, offset=offset)
+            has_more = len(products) > limit
+            with timed("validate"):
+                data = [ProductSchema.model_validate(i) for i in products[:limit]]
+            next_cursor = str(offset + limit) if has_more else None
+            return PaginatedResponseExtension.page(status_code=200, data=data, next_cursor=next_cursor)
+        except Exception as ex:
+            logger.error(f"Error in ProductService - search_products: {str(ex)}")
+            return ResponseExtension.response(status_code=500, message="An internal error occurred.")
+
+    async def stream_products(
+        self,
+        db: AsyncSession,
+        after: Optional[str] = None,
+        filters: Optional[ProductFilterSchema] = None,
+        fields: Optional[FrozenSet[str]] = None,
+    ) -> AsyncIterator[ProductSchema]:
+        schema = ProductSchema if fields is None else product_projection(fields)
+        try:
+            async for product in self.repository.stream_all(db, after=after, filters=filters, fields=fields):
+                yield schema.model_validate(product)
+        except Exception as ex:
+            # Headers are already sent at this point, so the stream is just cut short
+            logger.error(f"Error in ProductService - stream_products: {str(ex)}")
+
+    async def get_product_detail(
+        self, db: AsyncSession, product_id: str, fields: Optional[FrozenSet[str]] = None
+    ) -> ResponseExtension:
+        if fields is not None:
+            return await self._get_product_projection(db, product_id, fields)
+
+        if self.detail_cache is not None:
+            cached = self.detail_cache.get(product_id)
+            if cached is not None:
+                return cached
+
+        if self.single_flight is None:
+            return await self._load_product_detail(db, product_id)
+        # Concurrent misses for the same product share one query and validation
+        return await self.single_flight.do(product_id, lambda: self._load_shared_product_detail(product_id))
+
+    async def _load_shared_product_detail(self, product_id: str) -> ResponseExtension:
+        """
+        A shared load outlives the request that started it when that request is
+        cancelled, and the request's session is closed then, so it uses its own.
+        """
+        async with self.session_factory() as db:
+            return await self._load_product_detail(db, product_id)
+
+    async def _load_product_detail(self, db: AsyncSession, product_id: str) -> ResponseExtension:
+        generation = self.detail_cache.generation if self.detail_cache is not None else None
+        try:
+            stored = await self.repository.get_detail_payload(db, product_id)
+            if stored is not None:
+                result = self._stored_detail(*stored)
+            else:
+                # Not in the read model yet (e.g. before a backfill): build it from the tables
+                result = await self._render_product_detail(db, product_id)
+            # Only hits are cached; a miss must see a product created right after it
+            if self.detail_cache is not None and result.status_code == 200:
+                self.detail_cache.set(product_id, result, generation=generation)
+            return result
+        except Exception as ex:
+            logger.error(f"Error in ProductService - get_product_detail: {str(ex)}")
+            return ResponseExtension.response(
+                status_code=500,
+                message="An internal error occurred while retrieving the product."
+            )
+
+    def _stored_detail(self, version: int, payload: bytes) -> ResponseExtension:
+        """
+        Serves the stored payload bytes as the body without parsing them; `data`
+        keeps the version for the ETag and the bytes for sparse fieldsets.
+        """
+        return ResponseExtension.response(
+            status_code=200,
+            data=StoredProductDetail(version, payload),
+            message="Product retrieved successfully."
+        ).with_rendered_data(payload)
+
+    async def _render_product_detail(self, db: AsyncSession, product_id: str) -> ResponseExtension:
+        product = await self.repository.get_product_with_details(db, product_id)
+        if not product:
+            return ResponseExtension.response(
+                status_code=404,
+                message=f"Product with ID {product_id} not found."
+            )
+
+        with timed("validate"):
+            product_data = ProductSchema.model_validate(product)
+        
+        return ResponseExtension.response(
+            status_code=200,
+            data=product_data,
+            message="Product retrieved successfully."
+        )
+
+    async def _get_product_projection(self, db: AsyncSession, product_id: str, fields: FrozenSet[str]) -> ResponseExtension:
+        """
+        Sparse fieldset of a product detail. A cached full detail is projected in
+        memory; otherwise only the selected columns are read. Projections are not cached.
+        """
+        schema = product_projection(fields)
+        if self.detail_cache is not None:
+            cached = self.detail_cache.get(product_id)
+            if cached is not None:
+                data = cached.data.model() if isinstance(cached.data, StoredProductDetail) else cached.data
+                return ResponseExtension.response(
+                    status_code=cached.status_code, data=schema.model_validate(data), message=cached.message
+                )
+
+        try:
+            product = await self.repository.get_product_with_details(db, product_id, fields=fields)
             if not product:
                 return ResponseExtension.response(
                     status_code=404,
                     message=f"Product with ID {product_id} not found."
                 )
-            
-            product_data = ProductSchema.model_validate(product)
-            
+            with timed("validate"):
+                product_data = schema.model_validate(product)
             return ResponseExtension.response(
                 status_code=200,
                 data=product_data,
@@ -67,20 +312,148 @@ class ProductService:
                 message="An internal error occurred while retrieving the product."
             )
 
-    async def delete_all_products(self, db: Session) -> ResponseExtension:
+    async def get_product_version(self, db: AsyncSession, product_id: str) -> Optional[int]:
+        """
+        Current version of a product, for conditional requests. A cached detail already
+        carries it (the cache is invalidated on every write); otherwise it is a
+        single-column primary-key lookup, without relationships or validation.
+        """
+        if self.detail_cache is not None:
+            cached = self.detail_cache.peek(product_id)
+            if cached is not None:
+                return cached.data.version
+        return await self.repository.get_version(db, product_id)
+
+    async def get_catalog_version(self, db: AsyncSession) -> int:
+        return await self.repository.get_catalog_version(db)
+
+    async def delete_all_products(self, db: AsyncSession) -> ResponseExtension:
         try:
             await self.repository.delete_all(db)
+            if self.detail_cache is not None:
+                self.detail_cache.clear()
+            if self.single_flight is not None:
+                self.single_flight.forget_all()
             return ResponseExtension.response(status_code=200, message="All products deleted.")
         except Exception as ex:
             logger.error(f"Error in ProductService - delete_all_products: {str(ex)}")
             return ResponseExtension.response(status_code=500, message="An internal error occurred.")
 
-    async def delete_product(self, db: Session, product_id: str) -> ResponseExtension:
+    async def delete_product(self, db: AsyncSession, product_id: str) -> ResponseExtension:
         try:
             deleted = await self.repository.delete_by_id(db, product_id)
+            self._invalidate_detail(product_id)
             if not deleted:
                 return ResponseExtension.response(status_code=404, message="Product not found.")
             return ResponseExtension.response(status_code=200, message="Product deleted successfully.")
         except Exception as ex:
             logger.error(f"Error in ProductService - delete_product: {str(ex)}")
             return ResponseExtension.response(status_code=500, message="An internal error occurred.")
+
+    async def delete_products(self, db: AsyncSession, product_ids: List[str]) -> ResponseExtension:
+        try:
+            deleted = await self.repository.delete_many(db, product_ids)
+            for product_id in deleted:
+                self._invalidate_detail(product_id)
+
+            results = []
+            for product_id in dict.fromkeys(product_ids):
+                if product_id in deleted:
+                    results.append(BatchItemResultSchema(id=product_id, status_code=200, message="Product deleted successfully."))
+                else:
+                    results.append(BatchItemResultSchema(id=product_id, status_code=404, message="Product not found."))
+
+            return ResponseExtension.response(
+                # 207 Multi-Status when only some of the products existed
+                status_code=200 if len(deleted) == len(results) else 207,
+                data=results,
+                message=f"{len(deleted)} of {len(results)} products deleted."
+            )
+        except Exception as ex:
+            logger.error(f"Error in ProductService - delete_products: {str(ex)}")
+            return ResponseExtension.response(status_code=500, message="An internal error occurred.")
+
+    async def reserve_product(self, db: AsyncSession, product_id: str, quantity: int) -> ResponseExtension:
+        try:
+            reserved, available = await self._reserve(db, {product_id: quantity})
+        except Exception as ex:
+            return self._reservation_error("reserve_product", ex)
+
+        remaining = available[product_id]
+        if reserved:
+            self._invalidate_detail(product_id)
+            return ResponseExtension.response(
+                status_code=200,
+                data=ReservationResultSchema(id=product_id, status_code=200, message="Reserved.", available_quantity=remaining),
+                message=f"{quantity} units of {product_id} reserved."
+            )
+        if remaining is None:
+            return ResponseExtension.response(status_code=404, message=f"Product with ID {product_id} not found.")
+        return ResponseExtension.response(
+            status_code=409,
+            data=ReservationResultSchema(id=product_id, status_code=409, message="Insufficient stock.", available_quantity=remaining),
+            message="Insufficient stock."
+        )
+
+    async def reserve_cart(self, db: AsyncSession, items: List[ReservationItemSchema]) -> ResponseExtension:
+        """
+        Reserves every item of a cart or none of them.
+        """
+        quantities: Dict[str, int] = {}
+        for item in items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        try:
+            reserved, available = await self._reserve(db, quantities)
+        except Exception as ex:
+            return self._reservation_error("reserve_cart", ex)
+
+        results = []
+        for product_id, quantity in quantities.items():
+            remaining = available[product_id]
+            if reserved:
+                self._invalidate_detail(product_id)
+                results.append(ReservationResultSchema(id=product_id, status_code=200, message="Reserved.", available_quantity=remaining))
+            elif remaining is None:
+                results.append(ReservationResultSchema(id=product_id, status_code=404, message="Product not found."))
+            elif remaining < quantity:
+                results.append(ReservationResultSchema(id=product_id, status_code=409, message="Insufficient stock.", available_quantity=remaining))
+            else:
+                results.append(ReservationResultSchema(
+                    id=product_id, status_code=200, available_quantity=remaining,
+                    message="Available, but not reserved because other items are not."
+                ))
+        return ResponseExtension.response(
+            status_code=200 if reserved else 409,
+            data=results,
+            message="Cart reserved." if reserved else "Cart not reserved."
+        )
+
+    async def _reserve(self, db: AsyncSession, quantities: Dict[str, int]) -> Tuple[bool, Dict[str, Optional[int]]]:
+        """
+        The reservation is a single short write transaction. Reservations of this
+        process run one at a time; when SQLite stays locked past the busy timeout
+        anyway (another process is writing) it is retried a bounded number of times
+        with exponential backoff.
+        """
+        for attempt in range(settings.db_busy_retries + 1):
+            try:
+                async with reservation_lock:
+                    return await self.repository.reserve_many(db, quantities)
+            except Exception as ex:
+                if not is_busy_error(ex) or attempt == settings.db_busy_retries:
+                    raise
+                logger.warning(f"Database busy in ProductService - reserve, retry {attempt + 1}")
+                await asyncio.sleep(settings.db_busy_retry_delay_ms / 1000 * 2 ** attempt)
+
+    def _reservation_error(self, method: str, ex: Exception) -> ResponseExtension:
+        logger.error(f"Error in ProductService - {method}: {str(ex)}")
+        if is_busy_error(ex):
+            return ResponseExtension.response(status_code=503, message="The catalog is busy, please retry.")
+        return ResponseExtension.response(status_code=500, message="An internal error occurred.")
+
+    def _invalidate_detail(self, product_id: str) -> None:
+        if self.detail_cache is not None:
+            self.detail_cache.invalidate(product_id)
+        # A load that started before the write must not be shared with later readers
+        if self.single_flight is not None:
+            self.single_flight.forget(product_id)
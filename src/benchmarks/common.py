@@ -0,0 +1,144 @@
+"""
+Shared helpers for the benchmark scripts: running the API under uvicorn, seeding a
+catalog through the public endpoints and summarizing latencies.
+"""
+import asyncio
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+SEED_BATCH_SIZE = 5000
+SEED_CATEGORIES = ["MLB1051", "MLB1000", "MLB1648", "MLB5672", "MLB1574"]
+CONDITIONS = ["new", "used", "refurbished"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """
+    Runs `app.main:app` under uvicorn in a subprocess with the given environment.
+    """
+    def __init__(self, env: Optional[Dict[str, str]] = None, workers: int = 1):
+        self.port = free_port()
+        self.env = {**os.environ, "LOG_LEVEL": "WARNING", "WEB_CONCURRENCY": str(workers), **(env or {})}
+        self.workers = workers
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(self.port),
+             "--workers", str(self.workers), "--log-level", "warning", "--no-access-log"],
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def peak_rss_mb(self) -> Optional[float]:
+        """
+        Peak resident set size of the server process (VmHWM), Linux only.
+        """
+        try:
+            with open(f"/proc/{self.process.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    def stop(self) -> Optional[float]:
+        """
+        Stops the server and returns its peak RSS in MiB when it can be measured.
+        """
+        peak = self.peak_rss_mb()
+        self.process.terminate()
+        self.process.wait()
+        if peak is None and self.workers == 1:
+            # Fallback for platforms without /proc: max RSS over terminated children
+            max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            peak = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+        return peak
+
+
+@asynccontextmanager
+async def running_server(env: Optional[Dict[str, str]] = None, workers: int = 1, concurrency: int = 64) -> AsyncIterator[tuple]:
+    server = Server(env, workers)
+    server.start()
+    try:
+        limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+        async with httpx.AsyncClient(base_url=server.base_url, limits=limits, timeout=300) as client:
+            await wait_until_up(client)
+            yield server, client
+    finally:
+        if server.process.poll() is None:
+            server.stop()
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start in time")
+
+
+def product_payload(i: int, prefix: str = "BENCH") -> dict:
+    return {
+        "id": f"{prefix}{i:07d}",
+        "title": f"Benchmark product {i} smartphone {i % 97}",
+        "price": float((i * 7919) % 10000) / 10,
+        "available_quantity": i % 50,
+        "condition": CONDITIONS[i % len(CONDITIONS)],
+        "category_id": SEED_CATEGORIES[i % len(SEED_CATEGORIES)],
+        "description_text": f"Benchmark description for product {i}. " * 4,
+    }
+
+
+async def seed_catalog(client: httpx.AsyncClient, products: int) -> List[str]:
+    """
+    Replaces the catalog with `products` generated products through the batch endpoint.
+    """
+    await client.delete("/api/products/erase")
+    ids = []
+    for start in range(0, products, SEED_BATCH_SIZE):
+        batch = [product_payload(i) for i in range(start, min(start + SEED_BATCH_SIZE, products))]
+        response = await client.post("/api/products/batch", json=batch)
+        response.raise_for_status()
+        ids.extend(item["id"] for item in batch)
+    return ids
+
+
+def percentile(values: List[float], pct: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
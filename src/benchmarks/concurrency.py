@@ -0,0 +1,106 @@
+"""
+Concurrent-request throughput benchmark for the product API.
+
+Starts the app under uvicorn in a subprocess, seeds products through the public API
+and fires GET /api/products/{id} requests at a fixed concurrency, while a probe
+measures /health latency to show how much the event loop is being blocked.
+With --reserve-hot N, the requests are instead stock reservations spread over the
+first N products, to measure contended writes on hot SKUs.
+
+    cd src
+    python -m benchmarks.concurrency --products 500 --requests 5000 --concurrency 64
+    python -m benchmarks.concurrency --products 500 --requests 5000 --concurrency 64 --reserve-hot 5
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import percentile, product_payload, running_server, seed_catalog
+
+
+async def _run_load(client: httpx.AsyncClient, ids: list, requests: int, concurrency: int, reserve_hot: int = 0) -> dict:
+    latencies = []
+    health_latencies = []
+    rejected = 0
+    remaining = iter(range(requests))
+    done = asyncio.Event()
+
+    async def worker():
+        nonlocal rejected
+        for n in remaining:
+            start = time.perf_counter()
+            if reserve_hot:
+                response = await client.post(f"/api/products/{ids[n % reserve_hot]}/reserve", json={"quantity": 1})
+            else:
+                response = await client.get(f"/api/products/{ids[n % len(ids)]}")
+            latencies.append(time.perf_counter() - start)
+            # Once a hot SKU is sold out, reservations are answered with 409
+            if response.status_code == 409 and reserve_hot:
+                rejected += 1
+                continue
+            response.raise_for_status()
+
+    async def health_probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/health")
+            health_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    probe = asyncio.create_task(health_probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe
+
+    return {
+        "requests_per_second": requests / elapsed,
+        "rejected": rejected,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "health_p99_ms": percentile(health_latencies, 99) * 1000 if health_latencies else 0.0,
+    }
+
+
+async def _seed_hot_skus(client: httpx.AsyncClient, count: int, stock: int) -> list:
+    """
+    Adds `count` products with enough stock that no reservation of the run is rejected.
+    """
+    ids = []
+    for i in range(count):
+        payload = {**product_payload(i, prefix="HOT"), "available_quantity": stock}
+        response = await client.post("/api/products", json=payload)
+        response.raise_for_status()
+        ids.append(payload["id"])
+    return ids
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Concurrent write transactions need their own connections, which an
+        # in-memory database cannot provide
+        env = {"DATABASE_URL": f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"} if args.reserve_hot else None
+        async with running_server(env, concurrency=args.concurrency) as (server, client):
+            ids = await seed_catalog(client, args.products)
+            if args.reserve_hot:
+                ids = await _seed_hot_skus(client, args.reserve_hot, stock=args.requests)
+            result = await _run_load(client, ids, args.requests, args.concurrency, args.reserve_hot)
+
+    print(f"products={args.products} requests={args.requests} concurrency={args.concurrency}")
+    for key, value in result.items():
+        print(f"{key:>20}: {value:,.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--reserve-hot", type=int, default=0, metavar="N",
+                        help="reserve stock of the first N products instead of reading product details")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+"""
+Full-text search benchmark: FTS5 index versus a naive LIKE scan.
+
+Builds a temporary file-backed catalog of the requested size through the
+repository, then times ProductRepository.search against the equivalent
+`title LIKE '%term%' OR text LIKE '%term%'` query for a set of search terms.
+
+    cd src
+    python -m benchmarks.search --products 100000 --repeat 20
+"""
+import argparse
+import asyncio
+import dataclasses
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base, create_engine_from_settings
+from app.domain.models import Product, ProductDescription, SEARCH_TABLE
+from app.domain.schemas import ProductCreateSchema
+from app.repositories.product_repository import ProductRepository, to_match_query
+from benchmarks.common import percentile
+
+BATCH_SIZE = 10000
+WORDS = (
+    "samsung galaxy iphone xiaomi motorola notebook tablet monitor headset speaker camera lens "
+    "charger cable case cover glass keyboard mouse router drone watch band console controller "
+    "blender fryer kettle vacuum fan heater lamp chair desk shelf mattress pillow blanket towel"
+).split()
+# Common words match a large share of the synthetic catalog; model codes are selective,
+# like most real searches. Ranked FTS5 cost grows with the number of matches, while an
+# unranked LIKE with LIMIT is only fast when matches are common.
+TERMS = ["galaxy", "kettle", "notebook gamer", "cable usb", "x1234", "galaxy x777", "x9", "fone"]
+
+
+def product(i: int, rng: random.Random) -> ProductCreateSchema:
+    title = " ".join(rng.choice(WORDS) for _ in range(4)) + f" x{rng.randrange(10000)}"
+    description = " ".join(rng.choice(WORDS) for _ in range(40))
+    return ProductCreateSchema(id=f"SEARCH{i:08d}", title=title, price=float(i % 1000), category_id="MLB1051", description_text=description)
+
+
+async def timed(call, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        config = dataclasses.replace(settings, database_url=f"sqlite+aiosqlite:///{Path(tmp) / 'search.db'}")
+        engine = create_engine_from_settings(config)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        repository = ProductRepository()
+        rng = random.Random(7)
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        start = time.perf_counter()
+        async with session_factory() as db:
+            for offset in range(0, args.products, BATCH_SIZE):
+                batch = [product(i, rng) for i in range(offset, min(offset + BATCH_SIZE, args.products))]
+                await repository.create_many(db, batch)
+        print(f"Seeded {args.products:,} products in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'term':<16} | {'matches':>9} | {'FTS5 p50':>10} | {'FTS5 p99':>10} | {'LIKE p50':>10} | {'LIKE p99':>10}")
+        async with session_factory() as db:
+            for term in TERMS:
+                async def fts():
+                    await repository.search(db, term, limit=20)
+
+                async def like():
+                    pattern = f"%{term}%"
+                    stmt = (
+                        select(Product)
+                        .outerjoin(ProductDescription, ProductDescription.product_id == Product.id)
+                        .where(or_(Product.title.like(pattern), ProductDescription.text.like(pattern)))
+                        .limit(20)
+                    )
+                    (await db.scalars(stmt)).all()
+
+                match = to_match_query(term)
+                matches = await db.scalar(text(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match"), {"match": match})
+                fts_latencies = await timed(fts, args.repeat)
+                like_latencies = await timed(like, args.repeat)
+                print(f"{term:<16} | {matches:>9,} | {percentile(fts_latencies, 50) * 1000:>8.2f}ms | {percentile(fts_latencies, 99) * 1000:>8.2f}ms"
+                      f" | {percentile(like_latencies, 50) * 1000:>8.2f}ms | {percentile(like_latencies, 99) * 1000:>8.2f}ms")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
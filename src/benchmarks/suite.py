@@ -0,0 +1,202 @@
+"""
+Load and latency benchmark suite for the product API.
+
+For each catalog size the suite starts a fresh server on a temporary file-backed
+SQLite database, seeds it through POST /api/products/batch and drives the product
+endpoints at a fixed concurrency: detail (hit and 404), listing, stream, search,
+export, create, batch create, single-product reservation, delete and bulk
+delete. It reports p50/p95/p99 latency, requests per second and the server's
+peak RSS.
+
+    cd src
+    python -m benchmarks.suite --sizes 1000,10000 --requests 2000 --concurrency 32
+    python -m benchmarks.suite --sizes 1000 --save benchmarks/baseline.json
+    python -m benchmarks.suite --sizes 1000 --compare benchmarks/baseline.json
+
+Write scenarios run last and only touch products they created themselves: the
+reservations and deletes target the products created by the POST scenarios, so
+they need them to have run. DELETE /api/products/erase is exercised once per
+size when seeding.
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks.common import product_payload, running_server, seed_catalog, summarize
+
+RequestFactory = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+async def drive(client: httpx.AsyncClient, make_request: RequestFactory, requests: int, concurrency: int, expected_status: int) -> dict:
+    """
+    Issues `requests` calls with `concurrency` workers and summarizes the latencies.
+    Any status other than `expected_status` counts as an error.
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for n in counter:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, n)
+                if response.status_code != expected_status:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def build_scenarios(ids: List[str], requests: int) -> Dict[str, tuple]:
+    """
+    Maps each scenario name to (request factory, number of requests, expected status).
+    Scenarios run in insertion order; write scenarios come after the read ones.
+    """
+    rng = random.Random(42)
+    sample = [rng.choice(ids) for _ in range(1024)] if ids else ["MISSING"]
+    # Reads that depend on the catalog shape rather than a single row
+    heavy_requests = max(1, requests // 100)
+
+    async def detail(client, n):
+        return await client.get(f"/api/products/{sample[n % len(sample)]}")
+
+    async def not_found(client, n):
+        return await client.get(f"/api/products/NOTFOUND{n}")
+
+    async def list_page(client, n):
+        return await client.get("/api/products", params={"limit": 100, "after": sample[n % len(sample)]})
+
+    async def stream_all(client, n):
+        async with client.stream("GET", "/api/products", params={"stream": "true"}) as response:
+            async for _ in response.aiter_bytes():
+                pass
+        return response
+
+    async def search(client, n):
+        return await client.get("/api/products/search", params={"q": f"smartphone {n % 97}"})
+
+    async def export(client, n):
+        async with client.stream("GET", "/api/products/export", params={"format": "jsonl"}) as response:
+            async for _ in response.aiter_bytes():
+                pass
+        return response
+
+    async def create(client, n):
+        return await client.post("/api/products", json=product_payload(n, prefix="BENCHNEW"))
+
+    async def create_batch(client, n):
+        batch = [product_payload(n * 100 + i, prefix="BENCHBATCH") for i in range(100)]
+        return await client.post("/api/products/batch", json=batch)
+
+    # One unit of each product created above that has stock, so every reservation succeeds
+    in_stock = [i for i in range(requests) if product_payload(i, prefix="BENCHNEW")["available_quantity"] > 0]
+
+    async def reserve(client, n):
+        return await client.post(f"/api/products/BENCHNEW{in_stock[n]:07d}/reserve", json={"quantity": 1})
+
+    async def delete(client, n):
+        return await client.delete(f"/api/products/BENCHNEW{n:07d}")
+
+    async def delete_batch(client, n):
+        ids = [f"BENCHBATCH{n * 100 + i:07d}" for i in range(100)]
+        return await client.request("DELETE", "/api/products", json=ids)
+
+    return {
+        "GET /api/products/{id}": (detail, requests, 200),
+        "GET /api/products/{id} (404)": (not_found, requests, 404),
+        "GET /api/products?limit=100": (list_page, requests, 200),
+        "GET /api/products?stream=true": (stream_all, heavy_requests, 200),
+        "GET /api/products/search": (search, requests, 200),
+        "GET /api/products/export": (export, heavy_requests, 200),
+        "POST /api/products": (create, requests, 201),
+        "POST /api/products/batch (100 items)": (create_batch, heavy_requests, 201),
+        "POST /api/products/{id}/reserve": (reserve, len(in_stock), 200),
+        "DELETE /api/products/{id}": (delete, requests, 200),
+        "DELETE /api/products (100 items)": (delete_batch, heavy_requests, 200),
+    }
+
+
+async def benchmark_size(size: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {"DATABASE_URL": f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"}
+        async with running_server(env, concurrency=args.concurrency) as (server, client):
+            seed_start = time.perf_counter()
+            ids = await seed_catalog(client, size)
+            seed_seconds = time.perf_counter() - seed_start
+
+            scenarios = {}
+            for name, (make_request, requests, expected_status) in build_scenarios(ids, args.requests).items():
+                if args.only and not any(token in name for token in args.only):
+                    continue
+                scenarios[name] = await drive(client, make_request, requests, args.concurrency, expected_status)
+                print_row(size, name, scenarios[name])
+
+            peak_rss_mb = server.stop()
+
+    return {"seed_seconds": seed_seconds, "peak_rss_mb": peak_rss_mb, "scenarios": scenarios}
+
+
+def print_row(size: int, name: str, result: dict, baseline: dict = None) -> None:
+    line = (f"{size:>9,} | {name:<38} | {result['requests_per_second']:>9,.1f} rps | "
+            f"p50 {result['p50_ms']:>8.2f} | p95 {result['p95_ms']:>8.2f} | p99 {result['p99_ms']:>8.2f} ms | "
+            f"errors {result['errors']}")
+    if baseline:
+        delta = (result["requests_per_second"] / baseline["requests_per_second"] - 1) * 100
+        line += f" | rps {delta:+.1f}% vs baseline"
+    print(line, flush=True)
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print("\nComparison against baseline")
+    for size, size_result in results.items():
+        base_size = baseline.get(size)
+        if not base_size:
+            continue
+        for name, result in size_result["scenarios"].items():
+            if name in base_size["scenarios"]:
+                print_row(int(size), name, result, base_size["scenarios"][name])
+
+
+async def main(args) -> None:
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = await benchmark_size(size, args)
+        peak = results[str(size)]["peak_rss_mb"]
+        print(f"{size:>9,} | seeded in {results[str(size)]['seed_seconds']:.1f}s | peak RSS "
+              + (f"{peak:.1f} MiB" if peak is not None else "n/a"), flush=True)
+
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text())["results"])
+    if args.save:
+        report = {"concurrency": args.concurrency, "requests": args.requests, "results": results}
+        Path(args.save).write_text(json.dumps(report, indent=2))
+        print(f"\nSaved results to {args.save}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda v: [int(s) for s in v.split(",")], default=[1000, 10000],
+                        help="Comma-separated catalog sizes (e.g. 1000,100000,1000000)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--only", action="append", help="Run only scenarios whose name contains this text")
+    parser.add_argument("--save", help="Write the results as JSON to this path")
+    parser.add_argument("--compare", help="Compare against results saved earlier with --save")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,116 @@
+"""
+Read throughput of the product API as the number of uvicorn workers grows.
+
+Seeds a temporary file-backed catalog once, then for each worker count starts the
+app on it and drives GET /api/products/{id} from several client processes, so the
+load generator is not the bottleneck. Before each run it checks that a write made
+through one worker is seen by every worker, i.e. that cached details are
+invalidated across processes.
+
+    cd src
+    python -m benchmarks.workers --workers 1,2,4 --products 2000 --requests 20000
+
+Scaling is bounded by the number of cores: on a machine with fewer cores than
+workers plus client processes, throughput flattens out.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import percentile, running_server, seed_catalog
+
+
+async def _drive(base_url: str, ids: list, requests: int, concurrency: int) -> list:
+    latencies = []
+    remaining = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def worker():
+            for n in remaining:
+                start = time.perf_counter()
+                response = await client.get(f"/api/products/{ids[n % len(ids)]}")
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def _client_process(base_url: str, ids: list, requests: int, concurrency: int) -> list:
+    return asyncio.run(_drive(base_url, ids, requests, concurrency))
+
+
+async def _check_invalidation(base_url: str, product_id: str, workers: int) -> None:
+    """
+    Caches the product in every worker, changes it through one of them and reads it
+    back on fresh connections, which the kernel spreads over the workers.
+    """
+    async def read_quantity() -> int:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            response = await client.get(f"/api/products/{product_id}")
+            return response.json()["data"]["available_quantity"]
+
+    await asyncio.gather(*(read_quantity() for _ in range(workers * 8)))
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.post(f"/api/products/{product_id}/reserve", json={"quantity": 1})
+        response.raise_for_status()
+        expected = response.json()["data"]["available_quantity"]
+    seen = set(await asyncio.gather(*(read_quantity() for _ in range(workers * 8))))
+    if seen != {expected}:
+        raise RuntimeError(f"stale product detail served by a worker: saw {sorted(seen)}, expected {expected}")
+
+
+async def _run(env: dict, workers: int, ids: list, checked_id: str, args) -> dict:
+    async with running_server(env, workers=workers) as (server, client):
+        await _check_invalidation(server.base_url, checked_id, workers)
+        per_client = args.requests // args.clients
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(args.clients, mp_context=multiprocessing.get_context("spawn")) as pool:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, _client_process, server.base_url, ids, per_client, args.concurrency)
+                for _ in range(args.clients)
+            ))
+            elapsed = time.perf_counter() - start
+    latencies = [latency for result in results for latency in result]
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args) -> None:
+    worker_counts = [int(n) for n in args.workers.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {"DATABASE_URL": f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"}
+        async with running_server(env) as (server, client):
+            ids = await seed_catalog(client, args.products)
+        # Seeded stock is i % 50, so this one has room for a reservation per run
+        checked_id = ids[min(49, len(ids) - 1)]
+
+        print(f"products={args.products} requests={args.requests} clients={args.clients}x{args.concurrency} cpus={os.cpu_count()}")
+        print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        baseline = None
+        for workers in worker_counts:
+            result = await _run(env, workers, ids, checked_id, args)
+            baseline = baseline or result["requests_per_second"]
+            print(f"{workers:>8} {result['requests_per_second']:>10,.0f} {result['requests_per_second'] / baseline:>7.2f}x "
+                  f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per client process")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,53 @@
+from app.core.cache import LRUCache
+
+def test_get_and_set():
+    cache = LRUCache(maxsize=2)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+def test_expires_entries_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.core.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+
+    now[0] = 109.0
+    assert cache.get("a") == 1
+    now[0] = 110.0
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+def test_invalidate_and_clear():
+    cache = LRUCache(maxsize=4)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+    assert len(cache) == 0
+
+def test_set_skipped_when_invalidated_since_read():
+    cache = LRUCache(maxsize=4)
+    generation = cache.generation
+    cache.invalidate("a")
+    cache.set("a", "stale", generation=generation)
+    assert cache.get("a") is None
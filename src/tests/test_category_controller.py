@@ -0,0 +1,43 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+
+@pytest_asyncio.fixture
+async def ac():
+    # ASGITransport does not send lifespan events, so run startup explicitly
+    async with app.router.lifespan_context(app):
+        transport = ASGITransport(app=app)
+        yield AsyncClient(transport=transport, base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_category_stats(ac):
+    payload = [
+        {"id": "STAT1", "title": "Stat 1", "price": 10.0, "category_id": "STATCAT", "available_quantity": 2},
+        {"id": "STAT2", "title": "Stat 2", "price": 30.0, "category_id": "STATCAT"},
+    ]
+    async with ac:
+        await ac.post("/api/products/batch", json=payload)
+        response = await ac.get("/api/categories/STATCAT/stats")
+        assert response.status_code == 200
+        assert response.json()["data"] == {
+            "product_count": 2, "in_stock_count": 1, "min_price": 10.0, "max_price": 30.0, "average_price": 20.0,
+        }
+
+        await ac.delete("/api/products/STAT1")
+        response = await ac.get("/api/categories/STATCAT/stats")
+        assert response.json()["data"]["min_price"] == 30.0
+
+        await ac.delete("/api/products/STAT2")
+        response = await ac.get("/api/categories/STATCAT/stats")
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_list_categories(ac):
+    async with ac:
+        response = await ac.get("/api/categories")
+    assert response.status_code == 200
+    categories = {category["id"]: category for category in response.json()["data"]}
+    # The seeded category and its sample product
+    assert categories["MLB1051"]["name"] == "Cellphones and Smartphones"
+    assert categories["MLB1051"]["stats"]["product_count"] >= 1
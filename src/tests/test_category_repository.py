@@ -0,0 +1,92 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, text
+from app.domain.models import Category, CategoryStats
+from app.repositories.category_repository import CategoryRepository
+from app.repositories.product_repository import ProductRepository
+from app.domain.schemas import ProductCreateSchema
+
+@pytest_asyncio.fixture(scope="function")
+async def db_session(db_session):
+    db_session.add_all([Category(id="CAT1", name="Phones"), Category(id="CAT2", name="Empty")])
+    await db_session.commit()
+    return db_session
+
+@pytest.fixture
+def products():
+    return ProductRepository()
+
+@pytest.fixture
+def categories():
+    return CategoryRepository()
+
+def product(product_id: str, price: float, quantity: int = 1, category_id: str = "CAT1") -> ProductCreateSchema:
+    return ProductCreateSchema(id=product_id, title=product_id, price=price, available_quantity=quantity, category_id=category_id)
+
+async def stats_of(db, categories, category_id):
+    stats = await categories.get_stats(db, category_id)
+    if stats is None:
+        return None
+    await db.refresh(stats)
+    return (stats.product_count, stats.in_stock_count, stats.min_price, stats.max_price, stats.average_price)
+
+@pytest.mark.asyncio
+async def test_stats_follow_creates_and_deletes(db_session, products, categories):
+    await products.create(db_session, product("MLB1", 10.0))
+    await products.create(db_session, product("MLB2", 30.0, quantity=0))
+    await products.create_many(db_session, [product("MLB3", 20.0), product("MLB4", 5.0, category_id="CAT3")])
+    assert await stats_of(db_session, categories, "CAT1") == (3, 2, 10.0, 30.0, 20.0)
+    assert await stats_of(db_session, categories, "CAT3") == (1, 1, 5.0, 5.0, 5.0)
+
+    # Removing the bounds recomputes them from the remaining products
+    await products.delete_by_id(db_session, "MLB1")
+    await products.delete_many(db_session, ["MLB2"])
+    assert await stats_of(db_session, categories, "CAT1") == (1, 1, 20.0, 20.0, 20.0)
+
+    await products.delete_by_id(db_session, "MLB4")
+    assert await stats_of(db_session, categories, "CAT3") is None
+
+    await products.delete_all(db_session)
+    assert await stats_of(db_session, categories, "CAT1") is None
+
+@pytest.mark.asyncio
+async def test_stats_follow_stock_changes(db_session, products, categories):
+    await products.create(db_session, product("MLB1", 10.0, quantity=2))
+    await products.create(db_session, product("MLB2", 20.0, quantity=1))
+
+    await products.reserve_many(db_session, {"MLB1": 1, "MLB2": 1})
+    assert await stats_of(db_session, categories, "CAT1") == (2, 1, 10.0, 20.0, 15.0)
+
+@pytest.mark.asyncio
+async def test_stats_match_a_full_rebuild(db_session, products, categories):
+    await products.create_many(db_session, [product(f"MLB{i}", float(i % 7), quantity=i % 3, category_id=f"CAT{i % 4}") for i in range(40)])
+    await products.delete_many(db_session, [f"MLB{i}" for i in range(0, 40, 3)])
+
+    def snapshot(rows):
+        return sorted((row.category_id, row.product_count, row.in_stock_count, row.min_price, row.max_price, round(row.price_sum, 6)) for row in rows)
+
+    incremental = snapshot((await db_session.execute(select(CategoryStats).execution_options(populate_existing=True))).scalars())
+    await categories.rebuild_stats(db_session)
+    rebuilt = snapshot((await db_session.execute(select(CategoryStats).execution_options(populate_existing=True))).scalars())
+    assert incremental == rebuilt
+
+@pytest.mark.asyncio
+async def test_get_all_includes_categories_without_products(db_session, products, categories):
+    await products.create(db_session, product("MLB1", 10.0))
+
+    rows = await categories.get_all(db_session, limit=10)
+    assert [(category.id, stats.product_count if stats else None) for category, stats in rows] == [("CAT1", 1), ("CAT2", None)]
+
+    rows = await categories.get_all(db_session, limit=10, after="CAT1")
+    assert [category.id for category, _ in rows] == ["CAT2"]
+
+@pytest.mark.asyncio
+async def test_stats_backfill(db_session, products, categories):
+    await products.create(db_session, product("MLB1", 10.0))
+    await db_session.execute(text("DELETE FROM category_stats"))
+    await db_session.commit()
+    assert await categories.stats_are_empty(db_session)
+
+    assert await categories.rebuild_stats(db_session) == 1
+    assert not await categories.stats_are_empty(db_session)
+    assert await stats_of(db_session, categories, "CAT1") == (1, 1, 10.0, 10.0, 10.0)
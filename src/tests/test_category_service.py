@@ -0,0 +1,76 @@
+import pytest
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.models import Category, CategoryStats
+from app.services.category_service import CategoryService
+
+@pytest.fixture
+def mock_repository():
+    return Mock()
+
+@pytest.fixture
+def mock_db_session():
+    return Mock(spec=AsyncSession)
+
+def make_stats(category_id: str) -> CategoryStats:
+    return CategoryStats(category_id=category_id, product_count=4, in_stock_count=3, price_sum=100.0, min_price=10.0, max_price=40.0)
+
+@pytest.mark.asyncio
+async def test_get_category_stats(mock_repository, mock_db_session):
+    mock_repository.get_stats = AsyncMock(return_value=make_stats("CAT1"))
+    service = CategoryService(repository=mock_repository)
+
+    result = await service.get_category_stats(mock_db_session, "CAT1")
+
+    assert result.status_code == 200
+    assert result.data.model_dump() == {
+        "product_count": 4, "in_stock_count": 3, "min_price": 10.0, "max_price": 40.0, "average_price": 25.0,
+    }
+
+@pytest.mark.asyncio
+async def test_get_category_stats_of_empty_category(mock_repository, mock_db_session):
+    mock_repository.get_stats = AsyncMock(return_value=None)
+    mock_repository.exists = AsyncMock(return_value=True)
+    service = CategoryService(repository=mock_repository)
+
+    result = await service.get_category_stats(mock_db_session, "CAT1")
+
+    assert result.status_code == 200
+    assert result.data.product_count == 0
+    assert result.data.average_price is None
+
+@pytest.mark.asyncio
+async def test_get_category_stats_not_found(mock_repository, mock_db_session):
+    mock_repository.get_stats = AsyncMock(return_value=None)
+    mock_repository.exists = AsyncMock(return_value=False)
+    service = CategoryService(repository=mock_repository)
+
+    result = await service.get_category_stats(mock_db_session, "MISSING")
+
+    assert result.status_code == 404
+
+@pytest.mark.asyncio
+async def test_get_categories_paginates(mock_repository, mock_db_session):
+    mock_repository.get_all = AsyncMock(return_value=[
+        (Category(id="CAT1", name="One"), make_stats("CAT1")),
+        (Category(id="CAT2", name="Two"), None),
+        (Category(id="CAT3", name="Three"), None),
+    ])
+    service = CategoryService(repository=mock_repository)
+
+    result = await service.get_categories(mock_db_session, limit=2)
+
+    assert result.status_code == 200
+    assert [category.id for category in result.data] == ["CAT1", "CAT2"]
+    assert result.data[1].stats.product_count == 0
+    assert result.next_cursor == "CAT2"
+    mock_repository.get_all.assert_awaited_once_with(mock_db_session, limit=3, after=None)
+
+@pytest.mark.asyncio
+async def test_get_categories_error(mock_repository, mock_db_session):
+    mock_repository.get_all = AsyncMock(side_effect=Exception("DB Error"))
+    service = CategoryService(repository=mock_repository)
+
+    result = await service.get_categories(mock_db_session)
+
+    assert result.status_code == 500
@@ -0,0 +1,88 @@
+import gzip
+import pytest
+from httpx import AsyncClient, ASGITransport
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from app.core.compression import negotiate_encoding
+from app.core.middleware.compression_middleware import CompressionMiddleware
+
+BODY = b'{"data":"' + b"x" * 4096 + b'"}'
+
+async def large(request):
+    return Response(BODY, media_type="application/json", headers={"ETag": '"c-1"'})
+
+async def small(request):
+    return Response(b'{"data":1}', media_type="application/json")
+
+async def stream(request):
+    async def body():
+        yield b'{"id":1}\n'
+        yield b'{"id":2}\n'
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+async def encoded(request):
+    return Response(gzip.compress(BODY), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+async def binary(request):
+    return Response(b"\0" * 4096, media_type="image/png")
+
+@pytest.fixture
+def ac():
+    app = Starlette(routes=[
+        Route("/large", large), Route("/small", small), Route("/stream", stream),
+        Route("/encoded", encoded), Route("/binary", binary),
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("deflate, gzip;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*, gzip;q=0", None),
+])
+def test_negotiate_encoding(header, expected, monkeypatch):
+    monkeypatch.setattr("app.core.compression.brotli", None)
+    assert negotiate_encoding(header) == expected
+
+@pytest.mark.asyncio
+async def test_compresses_large_bodies(ac):
+    async with ac:
+        response = await ac.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"c-1"'
+    assert int(response.headers["Content-Length"]) < len(BODY)
+    assert response.content == BODY
+
+@pytest.mark.asyncio
+async def test_leaves_small_bodies_and_identity_requests_alone(ac):
+    async with ac:
+        small_response = await ac.get("/small", headers={"Accept-Encoding": "gzip"})
+        identity_response = await ac.get("/large", headers={"Accept-Encoding": "identity"})
+    for response in (small_response, identity_response):
+        assert "Content-Encoding" not in response.headers
+        assert response.headers["Vary"] == "Accept-Encoding"
+    assert identity_response.headers["ETag"] == '"c-1"'
+    assert identity_response.content == BODY
+
+@pytest.mark.asyncio
+async def test_compresses_streams_chunk_by_chunk(ac):
+    async with ac:
+        response = await ac.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert response.text == '{"id":1}\n{"id":2}\n'
+
+@pytest.mark.asyncio
+async def test_passes_through_encoded_and_binary_responses(ac):
+    async with ac:
+        encoded_response = await ac.get("/encoded", headers={"Accept-Encoding": "gzip"})
+        binary_response = await ac.get("/binary", headers={"Accept-Encoding": "gzip"})
+    assert encoded_response.content == BODY
+    assert "Vary" not in encoded_response.headers
+    assert "Content-Encoding" not in binary_response.headers
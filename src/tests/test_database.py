@@ -0,0 +1,83 @@
+import dataclasses
+import logging
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+from app.core.config import Settings
+from app.core.database import create_engine_from_settings, instrument_slow_queries
+from app.core.logging.logger import trace_id_var
+
+@pytest.mark.asyncio
+async def test_file_database_applies_pragmas(tmp_path):
+    config = dataclasses.replace(
+        Settings(),
+        database_url=f"sqlite+aiosqlite:///{tmp_path / 'catalog.db'}",
+        sqlite_busy_timeout_ms=1234,
+        sqlite_synchronous="NORMAL",
+    )
+    engine = create_engine_from_settings(config)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.scalar(text("PRAGMA journal_mode"))) == "wal"
+            assert (await conn.scalar(text("PRAGMA busy_timeout"))) == 1234
+            # NORMAL == 1
+            assert (await conn.scalar(text("PRAGMA synchronous"))) == 1
+    finally:
+        await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_memory_database_isolates_concurrent_sessions():
+    engine = create_engine_from_settings(dataclasses.replace(Settings(), database_url="sqlite+aiosqlite:///:memory:"))
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+        async with engine.connect() as writer, engine.connect() as other:
+            await writer.execute(text("INSERT INTO items VALUES (1)"))
+            # Uncommitted writes are neither visible to nor discarded by another session
+            assert (await other.execute(text("SELECT id FROM items"))).scalars().all() == []
+            await other.rollback()
+            await writer.commit()
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("SELECT id FROM items"))).scalars().all() == [1]
+    finally:
+        await engine.dispose()
+
+def test_pool_is_configurable(tmp_path):
+    engine = create_engine_from_settings(dataclasses.replace(Settings(), database_url=f"sqlite+aiosqlite:///{tmp_path / 'x.db'}", db_pool="null"))
+    assert isinstance(engine.pool, NullPool)
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged_with_plan_and_trace_id(caplog):
+    engine = create_engine_from_settings(Settings())
+    instrument_slow_queries(engine.sync_engine, threshold_ms=0)
+    token = trace_id_var.set("trace-slow")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+            caplog.clear()
+            with caplog.at_level(logging.WARNING, logger="app.slow_query"):
+                await conn.execute(text("SELECT name FROM items WHERE id = :id"), {"id": 7})
+    finally:
+        trace_id_var.reset(token)
+        await engine.dispose()
+
+    [record] = [record for record in caplog.records if record.name == "app.slow_query"]
+    message = record.getMessage()
+    assert "trace_id=trace-slow" in message
+    assert "SELECT name FROM items WHERE id = ?" in message
+    assert "(7,)" in message
+    assert "SEARCH items USING INTEGER PRIMARY KEY" in message
+
+@pytest.mark.asyncio
+async def test_failed_statements_leave_no_slow_query_state_on_the_connection():
+    engine = create_engine_from_settings(Settings())
+    instrument_slow_queries(engine.sync_engine, threshold_ms=1000)
+    try:
+        async with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                await conn.execute(text("SELECT * FROM missing"))
+            raw = await conn.get_raw_connection()
+            assert "slow_query_start_ns" not in raw.info
+    finally:
+        await engine.dispose()
@@ -0,0 +1,13 @@
+from app.core.etag import catalog_etag, etag_matches, product_etag
+
+def test_etag_matches_exact_list_weak_and_wildcard():
+    etag = product_etag("MLB1", 3)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(product_etag("MLB1", 4), etag)
+    assert not etag_matches(None, etag)
+
+def test_catalog_and_product_etags_differ():
+    assert catalog_etag(1) != product_etag("1", 1)
@@ -0,0 +1,125 @@
+import gzip
+import json
+import pytest
+from sqlalchemy import func, select
+from app.core.cache import LRUCache
+from app.domain.models import Category, Product, ProductDescription
+from app.repositories.product_repository import ProductRepository
+from app.services.import_service import CatalogImporter, find_catalog_files, read_rows
+
+@pytest.fixture
+def catalog_dir(tmp_path):
+    (tmp_path / "categories.csv").write_text("id,name\nCAT1,Phones\nCAT2,Laptops\n", encoding="utf-8")
+    products = [
+        {"id": "MLB1", "title": "Phone", "price": 10.0, "category_id": "CAT1", "description_text": "A phone"},
+        {"id": "MLB2", "title": "Laptop", "price": 20.0, "category_id": "CAT2"},
+        {"id": "MLB3", "title": "Tablet", "price": 15.0, "category_id": "CAT1"},
+    ]
+    with gzip.open(tmp_path / "products.jsonl.gz", "wt", encoding="utf-8") as file:
+        for product in products:
+            file.write(json.dumps(product) + "\n")
+        file.write("not json\n")
+        file.write(json.dumps({"id": "MLB4", "title": "No price", "category_id": "CAT1"}) + "\n")
+    (tmp_path / "descriptions.csv").write_text(
+        "product_id,text\nMLB2,A laptop\nMLB1,Duplicate of the inline description\nMLB9,Unknown product\n", encoding="utf-8"
+    )
+    return tmp_path
+
+async def count(db, model):
+    return await db.scalar(select(func.count()).select_from(model))
+
+def test_find_catalog_files(catalog_dir):
+    files = find_catalog_files(str(catalog_dir))
+
+    assert files == {
+        "categories": str(catalog_dir / "categories.csv"),
+        "products": str(catalog_dir / "products.jsonl.gz"),
+        "descriptions": str(catalog_dir / "descriptions.csv"),
+    }
+
+def test_read_rows_drops_empty_csv_cells(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text("id,title,thumbnail\nMLB1,Phone,\n", encoding="utf-8")
+
+    assert list(read_rows(str(path))) == [(2, {"id": "MLB1", "title": "Phone"})]
+
+@pytest.mark.asyncio
+async def test_import_files_in_batches(db_session, catalog_dir):
+    importer = CatalogImporter(ProductRepository(), batch_size=2)
+
+    reports = await importer.import_files(db_session, find_catalog_files(str(catalog_dir)))
+
+    assert [(r.kind, r.rows, r.inserted, r.rejected) for r in reports] == [
+        ("categories", 2, 2, 0),
+        ("products", 5, 3, 2),
+        ("descriptions", 3, 1, 1),
+    ]
+    assert reports[2].skipped == 1
+    assert all(report.rows_per_second > 0 for report in reports)
+    assert await count(db_session, Category) == 2
+    assert await count(db_session, Product) == 3
+    texts = dict((await db_session.execute(select(ProductDescription.product_id, ProductDescription.text))).all())
+    assert texts == {"MLB1": "A phone", "MLB2": "A laptop"}
+
+@pytest.mark.asyncio
+async def test_import_is_idempotent(db_session, catalog_dir):
+    importer = CatalogImporter(ProductRepository(), batch_size=100)
+    files = find_catalog_files(str(catalog_dir))
+    await importer.import_files(db_session, files)
+
+    reports = await importer.import_files(db_session, files)
+
+    assert [report.inserted for report in reports] == [0, 0, 0]
+    assert await count(db_session, Product) == 3
+
+@pytest.mark.asyncio
+async def test_description_import_bumps_product_version(db_session, catalog_dir):
+    importer = CatalogImporter(ProductRepository())
+    await importer.import_file(db_session, "categories", str(catalog_dir / "categories.csv"))
+    await importer.import_file(db_session, "products", str(catalog_dir / "products.jsonl.gz"))
+    before = await db_session.scalar(select(Product.version).where(Product.id == "MLB2"))
+
+    await importer.import_file(db_session, "descriptions", str(catalog_dir / "descriptions.csv"))
+
+    assert await db_session.scalar(select(Product.version).where(Product.id == "MLB2")) > before
+
+@pytest.mark.asyncio
+async def test_inline_description_of_existing_product_bumps_its_version(db_session):
+    repository = ProductRepository()
+    product = {"id": "MLB1", "title": "Phone", "price": 10.0, "currency_id": "BRL", "available_quantity": 1,
+               "thumbnail": "", "condition": "new", "category_id": "CAT1"}
+    await repository.import_batch(db_session, [], [dict(product)], [])
+    before = await repository.get_version(db_session, "MLB1")
+
+    # A re-imported products file now carries the description inline
+    await repository.import_batch(db_session, [], [dict(product)], [{"product_id": "MLB1", "text": "A phone"}])
+
+    assert await repository.get_version(db_session, "MLB1") > before
+    unchanged = await repository.get_version(db_session, "MLB1")
+    await repository.import_batch(db_session, [], [dict(product)], [{"product_id": "MLB1", "text": "A phone"}])
+    assert await repository.get_version(db_session, "MLB1") == unchanged
+
+@pytest.mark.asyncio
+async def test_category_import_bumps_catalog_and_product_versions(db_session, catalog_dir):
+    repository = ProductRepository()
+    importer = CatalogImporter(repository)
+    await importer.import_file(db_session, "products", str(catalog_dir / "products.jsonl.gz"))
+    catalog_before = await repository.get_catalog_version(db_session)
+    before = dict((await db_session.execute(select(Product.id, Product.version))).all())
+
+    await importer.import_file(db_session, "categories", str(catalog_dir / "categories.csv"))
+
+    catalog_after = await repository.get_catalog_version(db_session)
+    assert catalog_after > catalog_before
+    after = dict((await db_session.execute(select(Product.id, Product.version))).all())
+    assert all(after[product_id] == catalog_after > before[product_id] for product_id in before)
+
+@pytest.mark.asyncio
+async def test_import_clears_detail_cache(db_session, catalog_dir):
+    cache = LRUCache(maxsize=10)
+    cache.set("MLB1", object())
+    importer = CatalogImporter(ProductRepository(), detail_cache=cache)
+
+    await importer.import_file(db_session, "categories", str(catalog_dir / "categories.csv"))
+
+    assert cache.get("MLB1") is None
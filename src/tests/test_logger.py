@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueListener
+from app.core.logging.logger import (
+    JsonFormatter, NonBlockingQueueHandler, TraceIdFilter, TraceSampler, trace_id_var, worker_log_file,
+)
+
+def make_record(level=logging.INFO, msg="hello %s", args=("world",)):
+    return logging.LogRecord("app.test", level, __file__, 10, msg, args, None)
+
+def test_json_formatter_outputs_one_object_per_record():
+    record = make_record()
+    record.trace_id = "abc"
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "hello world"
+    assert entry["trace_id"] == "abc"
+    assert entry["level"] == "INFO"
+
+def test_sampler_keeps_or_drops_whole_traces():
+    sampler = TraceSampler(rate=0.5)
+    decisions = {}
+    for i in range(200):
+        token = trace_id_var.set(f"trace-{i}")
+        try:
+            first = sampler.filter(make_record())
+            second = sampler.filter(make_record())
+        finally:
+            trace_id_var.reset(token)
+        assert first == second
+        decisions[i] = first
+    kept = sum(decisions.values())
+    assert 0 < kept < 200
+
+def test_sampler_never_drops_errors():
+    sampler = TraceSampler(rate=0.0)
+    assert sampler.filter(make_record()) is False
+    assert sampler.filter(make_record(level=logging.ERROR)) is True
+
+def test_queue_handler_delivers_to_listener_and_drops_when_full():
+    received = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            received.append(self.format(record))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.addFilter(TraceIdFilter())
+    token = trace_id_var.set("trace-1")
+    try:
+        handler.handle(make_record())
+        handler.handle(make_record())
+    finally:
+        trace_id_var.reset(token)
+    assert handler.dropped == 1
+
+    listener = QueueListener(handler.queue, Collect())
+    listener.start()
+    listener.stop()
+    assert received == ["hello world"]
+
+def test_each_worker_logs_to_its_own_file():
+    assert worker_log_file("logs/app.log", workers=1) == "logs/app.log"
+    assert worker_log_file("logs/app.log", workers=4) == f"logs/app.{os.getpid()}.log"
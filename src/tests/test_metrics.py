@@ -0,0 +1,79 @@
+import re
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core.metrics import Counter, Histogram, RequestTimings, instrument_engine, request_timings_var, timed
+from app.main import app
+
+@pytest_asyncio.fixture
+async def ac():
+    async with app.router.lifespan_context(app):
+        transport = ASGITransport(app=app)
+        yield AsyncClient(transport=transport, base_url="http://test")
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0), labelnames=("route",))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.1, "/a")
+    histogram.observe(5.0, "/a")
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+def test_counter_renders_labels():
+    counter = Counter("errors_total", "Errors.", labelnames=("route",))
+    counter.inc("/a")
+    counter.inc("/a")
+    assert 'errors_total{route="/a"} 2.0' in counter.render()
+
+def test_timed_accumulates_into_current_request():
+    timings = RequestTimings()
+    token = request_timings_var.set(timings)
+    try:
+        with timed("validate"):
+            pass
+        with timed("validate"):
+            pass
+    finally:
+        request_timings_var.reset(token)
+    assert "validate" in timings.phases
+    assert timings.server_timing(1_000_000).endswith("total;dur=1.00")
+
+@pytest.mark.asyncio
+async def test_failed_statements_leave_no_timing_state_on_the_connection():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    instrument_engine(engine.sync_engine)
+    timings = RequestTimings()
+    token = request_timings_var.set(timings)
+    try:
+        async with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                await conn.execute(text("SELECT * FROM missing"))
+            await conn.execute(text("SELECT 1"))
+            raw = await conn.get_raw_connection()
+            assert not any("start" in key for key in raw.info)
+    finally:
+        request_timings_var.reset(token)
+        await engine.dispose()
+    assert timings.db_queries == 1
+
+@pytest.mark.asyncio
+async def test_server_timing_header_and_metrics_endpoint(ac):
+    async with ac:
+        response = await ac.get("/api/products/MLB123456")
+        server_timing = response.headers["Server-Timing"]
+        assert re.search(r'db;dur=[\d.]+;desc="[1-9]\d* queries"', server_timing)
+        assert "total;dur=" in server_timing
+
+        response = await ac.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/products/{product_id}"' in response.text
+    assert "http_request_db_queries_bucket" in response.text
+    assert 'product_detail_cache{stat="hits"}' in response.text
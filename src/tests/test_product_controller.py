@@ -1,11 +1,17 @@
+import csv
+import io
+import json
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from app.main import app
 
-@pytest.fixture
-def ac():
-    transport = ASGITransport(app=app)
-    return AsyncClient(transport=transport, base_url="http://test")
+@pytest_asyncio.fixture
+async def ac():
+    # ASGITransport does not send lifespan events, so run startup explicitly
+    async with app.router.lifespan_context(app):
+        transport = ASGITransport(app=app)
+        yield AsyncClient(transport=transport, base_url="http://test")
 
 @pytest.mark.asyncio
 async def test_erase_all_products(ac):
@@ -99,3 +105,194 @@ async def test_get_product_by_id(ac):
     assert response.status_code == 200
     assert response.json()["data"]["id"] == "MLB1"
     assert response.json()["data"]["title"] == "Product 1"
+
+@pytest.mark.asyncio
+async def test_get_all_products_paginated(ac):
+    async with ac:
+        response = await ac.get("/api/products", params={"limit": 1})
+        body = response.json()
+        assert response.status_code == 200
+        assert [p["id"] for p in body["data"]] == ["MLB1"]
+        assert body["next_cursor"] == "MLB1"
+
+        response = await ac.get("/api/products", params={"limit": 1, "after": body["next_cursor"]})
+    body = response.json()
+    assert [p["id"] for p in body["data"]] == ["MLB3"]
+    assert body["next_cursor"] is None
+
+@pytest.mark.asyncio
+async def test_get_all_products_stream(ac):
+    async with ac:
+        response = await ac.get("/api/products", params={"stream": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [p["id"] for p in lines] == ["MLB1", "MLB3"]
+
+@pytest.mark.asyncio
+async def test_create_products_batch(ac):
+    payload = [
+        {"id": "MLB3", "title": "Product 3", "price": 30.0, "category_id": "CAT3"},
+        {"id": "MLB4", "title": "Product 4", "price": 40.0, "category_id": "CAT4"},
+        {"id": "MLB4", "title": "Product 4 again", "price": 40.0, "category_id": "CAT4"},
+        {"id": "MLB5", "title": "Product 5", "price": 50.0, "category_id": "CAT5", "description_text": "Fifth"},
+    ]
+    async with ac:
+        response = await ac.post("/api/products/batch", json=payload)
+        assert response.status_code == 207
+        assert [item["status_code"] for item in response.json()["data"]] == [400, 201, 400, 201]
+
+        response = await ac.get("/api/products/MLB5")
+    assert response.status_code == 200
+    assert response.json()["data"]["description"]["text"] == "Fifth"
+
+@pytest.mark.asyncio
+async def test_search_products(ac):
+    async with ac:
+        response = await ac.get("/api/products/search", params={"q": "fifth"})
+        assert response.status_code == 200
+        assert [p["id"] for p in response.json()["data"]] == ["MLB5"]
+
+        response = await ac.get("/api/products/search", params={"q": "product", "limit": 2})
+        body = response.json()
+        assert len(body["data"]) == 2
+        assert body["next_cursor"] == "2"
+
+        response = await ac.get("/api/products/search", params={"q": "product", "limit": 2, "after": "2"})
+    assert len(response.json()["data"]) == 2
+
+@pytest.mark.asyncio
+async def test_get_all_products_filtered_and_sorted(ac):
+    async with ac:
+        response = await ac.get("/api/products", params={"sort": "-price", "min_price": 20, "limit": 1})
+        body = response.json()
+        assert [p["id"] for p in body["data"]] == ["MLB5"]
+
+        response = await ac.get("/api/products", params={"sort": "-price", "min_price": 20, "limit": 1, "after": body["next_cursor"]})
+        assert [p["id"] for p in response.json()["data"]] == ["MLB4"]
+
+        response = await ac.get("/api/products", params={"category_id": "CAT3"})
+    assert [p["id"] for p in response.json()["data"]] == ["MLB3"]
+
+@pytest.mark.asyncio
+async def test_get_product_conditional(ac):
+    async with ac:
+        response = await ac.get("/api/products/MLB1")
+        etag = response.headers["ETag"]
+
+        response = await ac.get("/api/products/MLB1", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+        await ac.delete("/api/products/MLB1")
+        await ac.post("/api/products", json={"id": "MLB1", "title": "Product 1", "price": 10.0, "category_id": "CAT1"})
+        response = await ac.get("/api/products/MLB1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+@pytest.mark.asyncio
+async def test_get_all_products_conditional(ac):
+    async with ac:
+        response = await ac.get("/api/products")
+        etag = response.headers["ETag"]
+
+        response = await ac.get("/api/products", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        await ac.post("/api/products", json={"id": "MLB6", "title": "Product 6", "price": 60.0, "category_id": "CAT6"})
+        response = await ac.get("/api/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+@pytest.mark.asyncio
+async def test_export_products_jsonl(ac):
+    async with ac:
+        response = await ac.get("/api/products/export", params={"min_price": 30})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ["MLB3", "MLB4", "MLB5", "MLB6"]
+    assert rows[2]["description_text"] == "Fifth"
+
+@pytest.mark.asyncio
+async def test_export_products_csv_gzip(ac):
+    async with ac:
+        response = await ac.get("/api/products/export", params={"format": "csv", "gzip": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/csv")
+    # httpx decodes the gzip content encoding
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["id"] for row in rows] == ["MLB1", "MLB3", "MLB4", "MLB5", "MLB6"]
+    assert rows[0]["title"] == "Product 1"
+
+@pytest.mark.asyncio
+async def test_delete_products_bulk(ac):
+    async with ac:
+        response = await ac.request("DELETE", "/api/products", json=["MLB3", "MISSING"])
+        assert response.status_code == 207
+        assert [item["status_code"] for item in response.json()["data"]] == [200, 404]
+
+        response = await ac.get("/api/products/MLB3")
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_get_products_with_fields(ac):
+    async with ac:
+        response = await ac.get("/api/products", params={"fields": "id,title,price", "sort": "price", "limit": 1})
+        body = response.json()
+        assert response.status_code == 200
+        assert body["data"] == [{"id": "MLB1", "title": "Product 1", "price": 10.0}]
+
+        response = await ac.get("/api/products", params={"fields": "id", "sort": "price", "limit": 1, "after": body["next_cursor"]})
+        assert response.json()["data"] == [{"id": "MLB4"}]
+
+        response = await ac.get("/api/products/MLB5", params={"fields": "id,description"})
+        assert response.status_code == 200
+        assert response.json()["data"] == {"id": "MLB5", "description": {"text": "Fifth"}}
+        assert "ETag" in response.headers
+
+        response = await ac.get("/api/products", params={"fields": "id,secret"})
+    assert response.status_code == 400
+    assert "secret" in response.json()["message"]
+
+@pytest.mark.asyncio
+async def test_reserve_product(ac):
+    async with ac:
+        await ac.post("/api/products", json={"id": "MLB7", "title": "Product 7", "price": 70.0, "category_id": "CAT7", "available_quantity": 3})
+        response = await ac.post("/api/products/MLB7/reserve", json={"quantity": 2})
+        assert response.status_code == 200
+        assert response.json()["data"]["available_quantity"] == 1
+
+        response = await ac.post("/api/products/MLB7/reserve", json={"quantity": 2})
+        assert response.status_code == 409
+
+        response = await ac.post("/api/products/reserve", json=[{"product_id": "MLB7"}, {"product_id": "MISSING"}])
+        assert response.status_code == 409
+        assert [item["status_code"] for item in response.json()["data"]] == [200, 404]
+
+        response = await ac.post("/api/products/MLB7/reserve")
+        assert response.status_code == 200
+
+        response = await ac.get("/api/products/MLB7")
+    assert response.json()["data"]["available_quantity"] == 0
+
+@pytest.mark.asyncio
+async def test_get_all_products_compressed(ac):
+    payload = [{"id": f"MLB{i}", "title": f"Product {i}", "price": float(i), "category_id": "CAT8"} for i in range(10, 20)]
+    async with ac:
+        await ac.post("/api/products/batch", json=payload)
+        response = await ac.get("/api/products", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.json()["data"]
+        etag = response.headers["ETag"]
+        assert etag.startswith("W/")
+
+        response = await ac.get("/api/products", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
+
+        response = await ac.get("/api/products", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == etag[2:]
@@ -1,27 +1,31 @@
+import json
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.domain.models import Base, Product, Category, ProductDescription
-from app.repositories.product_repository import ProductRepository
-from app.domain.schemas import ProductCreateSchema
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-@pytest.fixture(scope="function")
-def db_session():
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
+import pytest_asyncio
+from contextlib import contextmanager
+from sqlalchemy import event, text
+from sqlalchemy.dialects import sqlite
+from app.domain.models import Product, Category, ProductDescription
+from app.repositories.product_repository import EXPORT_FIELDS, ProductRepository
+from app.domain.schemas import ProductCreateSchema, ProductSchema, ProductFilterSchema, ProductSort, product_projection
+from tests.conftest import engine
+
+@pytest_asyncio.fixture(scope="function")
+async def db_session(db_session):
+    # Pre-seed category
+    db_session.add(Category(id="CAT1", name="Test Category"))
+    await db_session.commit()
+    return db_session
+
+@contextmanager
+def count_queries():
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
     try:
-        # Pre-seed category
-        cat = Category(id="CAT1", name="Test Category")
-        db.add(cat)
-        db.commit()
-        yield db
+        yield statements
     finally:
-        db.close()
-        Base.metadata.drop_all(bind=engine)
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
 
 @pytest.fixture
 def repository():
@@ -72,6 +76,32 @@ async def test_delete_by_id(db_session, repository):
     product = await repository.get_product_with_details(db_session, "MLB1")
     assert product is None
 
+@pytest.mark.asyncio
+async def test_delete_by_id_cascades_in_one_statement(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product", price=100.0, category_id="CAT1", description_text="Text"))
+
+    with count_queries() as statements:
+        deleted = await repository.delete_by_id(db_session, "MLB1")
+
+    assert deleted is True
+    assert len([s for s in statements if s.startswith("DELETE")]) == 1
+    assert not any(s.startswith("SELECT") for s in statements)
+    assert (await db_session.execute(text("SELECT COUNT(*) FROM product_descriptions"))).scalar() == 0
+    assert await repository.delete_by_id(db_session, "MLB1") is False
+
+@pytest.mark.asyncio
+async def test_delete_many(db_session, repository):
+    for i in range(1, 4):
+        await repository.create(db_session, ProductCreateSchema(id=f"MLB{i}", title=f"Test Product {i}", price=10.0, category_id="CAT1", description_text=f"Text {i}"))
+    version = await repository.get_catalog_version(db_session)
+
+    deleted = await repository.delete_many(db_session, ["MLB1", "MLB3", "MISSING"])
+
+    assert deleted == {"MLB1", "MLB3"}
+    assert [p.id for p in await repository.get_all(db_session)] == ["MLB2"]
+    assert (await db_session.execute(text("SELECT product_id FROM product_descriptions"))).scalars().all() == ["MLB2"]
+    assert await repository.get_catalog_version(db_session) > version
+
 @pytest.mark.asyncio
 async def test_delete_all(db_session, repository):
     schema = ProductCreateSchema(id="MLB1", title="Test Product", price=100.0, category_id="CAT1")
@@ -81,3 +111,316 @@ async def test_delete_all(db_session, repository):
     
     products = await repository.get_all(db_session)
     assert len(products) == 0
+
+@pytest.mark.asyncio
+async def test_get_all_keyset_pagination(db_session, repository):
+    for i in range(1, 4):
+        await repository.create(db_session, ProductCreateSchema(id=f"MLB{i}", title=f"Test Product {i}", price=10.0 * i, category_id="CAT1"))
+
+    first_page = await repository.get_all(db_session, limit=2)
+    assert [p.id for p in first_page] == ["MLB1", "MLB2"]
+
+    second_page = await repository.get_all(db_session, limit=2, after=first_page[-1].id)
+    assert [p.id for p in second_page] == ["MLB3"]
+
+@pytest.mark.asyncio
+async def test_stream_all(db_session, repository):
+    for i in range(1, 4):
+        await repository.create(db_session, ProductCreateSchema(id=f"MLB{i}", title=f"Test Product {i}", price=10.0 * i, category_id="CAT1"))
+
+    streamed = [p.id async for p in repository.stream_all(db_session, after="MLB1", batch_size=1)]
+    assert streamed == ["MLB2", "MLB3"]
+
+@pytest.mark.asyncio
+async def test_get_all_does_not_lazy_load_relationships(db_session, repository):
+    for i in range(1, 21):
+        await repository.create(db_session, ProductCreateSchema(id=f"MLB{i:02d}", title=f"Test Product {i}", price=10.0, category_id="CAT1", description_text=f"Description {i}"))
+    db_session.expire_all()
+
+    with count_queries() as statements:
+        products = await repository.get_all(db_session)
+        data = [ProductSchema.model_validate(p) for p in products]
+
+    assert len(data) == 20
+    assert all(p.category.id == "CAT1" and p.description is not None for p in data)
+    # One SELECT for products plus one select-in per relationship, independent of page size
+    assert len(statements) == 3
+
+@pytest.mark.asyncio
+async def test_get_product_with_details_single_query(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product", price=100.0, category_id="CAT1", description_text="Test description"))
+    db_session.expire_all()
+
+    with count_queries() as statements:
+        product = await repository.get_product_with_details(db_session, "MLB1")
+        data = ProductSchema.model_validate(product)
+
+    assert data.category.name == "Test Category"
+    assert data.description.text == "Test description"
+    assert len(statements) == 1
+
+@pytest.mark.asyncio
+async def test_create_many(db_session, repository):
+    schemas = [
+        ProductCreateSchema(id=f"MLB{i}", title=f"Test Product {i}", price=10.0, category_id="CAT1", description_text=f"Description {i}" if i % 2 else None)
+        for i in range(1, 101)
+    ]
+    with count_queries() as statements:
+        await repository.create_many(db_session, schemas)
+    # One executemany per table, regardless of how many rows are inserted
+    assert len([s for s in statements if s.startswith("INSERT")]) == 2
+
+    assert await repository.get_existing_ids(db_session, ["MLB1", "MLB100", "MLB101"]) == {"MLB1", "MLB100"}
+    product = await repository.get_product_with_details(db_session, "MLB1")
+    assert product.description.text == "Description 1"
+
+@pytest.mark.asyncio
+async def test_search_ranks_title_matches_first(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Phone case", price=10.0, category_id="CAT1", description_text="Fits the Galaxy S23"))
+    await repository.create(db_session, ProductCreateSchema(id="MLB2", title="Samsung Galaxy S23", price=10.0, category_id="CAT1", description_text="Smartphone"))
+    await repository.create_many(db_session, [ProductCreateSchema(id="MLB3", title="Galaxy projector lamp", price=10.0, category_id="CAT1")])
+    await repository.create(db_session, ProductCreateSchema(id="MLB4", title="Notebook", price=10.0, category_id="CAT1"))
+
+    results = await repository.search(db_session, "galaxy s23", limit=10)
+    assert [p.id for p in results] == ["MLB2", "MLB1"]
+
+    prefix_results = [p.id for p in await repository.search(db_session, "galax", limit=10)]
+    assert sorted(prefix_results[:2]) == ["MLB2", "MLB3"]
+    assert prefix_results[2] == "MLB1"
+    assert [p.id for p in await repository.search(db_session, "galax", limit=1, offset=2)] == ["MLB1"]
+    assert await repository.search(db_session, '"" OR *', limit=10) == []
+
+@pytest.mark.asyncio
+async def test_delete_all_in_chunks(db_session, repository):
+    for i in range(1, 6):
+        await repository.create(db_session, ProductCreateSchema(id=f"MLB{i}", title=f"Test Product {i}", price=10.0, category_id="CAT1", description_text=f"Text {i}"))
+
+    with count_queries() as statements:
+        deleted = await repository.delete_all(db_session, chunk_size=2)
+
+    assert deleted == 5
+    assert len([s for s in statements if s.startswith("DELETE")]) == 3
+    assert (await db_session.execute(text("SELECT COUNT(*) FROM product_descriptions"))).scalar() == 0
+
+@pytest.mark.asyncio
+async def test_delete_all_bumps_catalog_version_only_for_chunks_that_deleted_rows(db_session, repository):
+    start = await repository.get_catalog_version(db_session)
+    assert await repository.delete_all(db_session) == 0
+    assert await repository.get_catalog_version(db_session) == start
+
+    for i in range(1, 5):
+        await repository.create(db_session, ProductCreateSchema(id=f"MLB{i}", title=f"Test Product {i}", price=10.0, category_id="CAT1"))
+    created = await repository.get_catalog_version(db_session)
+
+    # Two full chunks and a final empty one
+    assert await repository.delete_all(db_session, chunk_size=2) == 4
+    assert await repository.get_catalog_version(db_session) == created + 2
+
+@pytest.mark.asyncio
+async def test_search_index_follows_deletes(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Samsung Galaxy", price=10.0, category_id="CAT1", description_text="Android phone"))
+    await repository.create(db_session, ProductCreateSchema(id="MLB2", title="Galaxy Tab", price=10.0, category_id="CAT1"))
+
+    await repository.delete_by_id(db_session, "MLB1")
+    assert [p.id for p in await repository.search(db_session, "galaxy", limit=10)] == ["MLB2"]
+    assert await repository.search(db_session, "android", limit=10) == []
+
+    await repository.delete_all(db_session)
+    assert await repository.search(db_session, "galaxy", limit=10) == []
+
+@pytest.mark.asyncio
+async def test_rebuild_search_index(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Samsung Galaxy", price=10.0, category_id="CAT1", description_text="Android phone"))
+    await repository.rebuild_search_index(db_session)
+    assert [p.id for p in await repository.search(db_session, "android", limit=10)] == ["MLB1"]
+
+async def create_storefront_catalog(db_session, repository):
+    await repository.create_many(db_session, [
+        ProductCreateSchema(id="MLB1", title="Phone A", price=300.0, category_id="CAT1", condition="new", available_quantity=5),
+        ProductCreateSchema(id="MLB2", title="Phone B", price=100.0, category_id="CAT1", condition="used", available_quantity=0),
+        ProductCreateSchema(id="MLB3", title="Phone C", price=200.0, category_id="CAT1", condition="new", available_quantity=1),
+        ProductCreateSchema(id="MLB4", title="Laptop", price=150.0, category_id="CAT2", condition="new", available_quantity=3),
+    ])
+
+@pytest.mark.asyncio
+async def test_get_all_filters(db_session, repository):
+    await create_storefront_catalog(db_session, repository)
+
+    async def ids(**kwargs):
+        return [p.id for p in await repository.get_all(db_session, filters=ProductFilterSchema(**kwargs))]
+
+    assert await ids(category_id="CAT1") == ["MLB1", "MLB2", "MLB3"]
+    assert await ids(category_id="CAT1", condition="new") == ["MLB1", "MLB3"]
+    assert await ids(min_price=150.0, max_price=250.0) == ["MLB3", "MLB4"]
+    assert await ids(in_stock=True) == ["MLB1", "MLB3", "MLB4"]
+    assert await ids(in_stock=False) == ["MLB2"]
+
+@pytest.mark.asyncio
+async def test_get_all_sorted_by_price_with_keyset(db_session, repository):
+    await create_storefront_catalog(db_session, repository)
+
+    ascending = ProductFilterSchema(sort=ProductSort.PRICE)
+    first_page = await repository.get_all(db_session, limit=2, filters=ascending)
+    assert [p.id for p in first_page] == ["MLB2", "MLB4"]
+    second_page = await repository.get_all(db_session, limit=2, after=(first_page[-1].price, first_page[-1].id), filters=ascending)
+    assert [p.id for p in second_page] == ["MLB3", "MLB1"]
+
+    descending = ProductFilterSchema(category_id="CAT1", sort=ProductSort.PRICE_DESC)
+    assert [p.id for p in await repository.get_all(db_session, after=(300.0, "MLB1"), filters=descending)] == ["MLB3", "MLB2"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filters, after", [
+    (ProductFilterSchema(), "MLB1"),
+    (ProductFilterSchema(category_id="CAT1"), None),
+    (ProductFilterSchema(category_id="CAT1"), "MLB1"),
+    (ProductFilterSchema(category_id="CAT1", in_stock=True), None),
+    (ProductFilterSchema(category_id="CAT1", condition="new"), None),
+    (ProductFilterSchema(category_id="CAT1", min_price=10.0, max_price=500.0, sort=ProductSort.PRICE), (10.0, "MLB1")),
+    (ProductFilterSchema(category_id="CAT1", condition="new", min_price=10.0, sort=ProductSort.PRICE_DESC), None),
+    (ProductFilterSchema(condition="new"), None),
+    (ProductFilterSchema(condition="new"), "MLB1"),
+    (ProductFilterSchema(condition="used", sort=ProductSort.PRICE), None),
+    (ProductFilterSchema(min_price=10.0, max_price=500.0, sort=ProductSort.PRICE), None),
+    (ProductFilterSchema(sort=ProductSort.PRICE_DESC), (300.0, "MLB1")),
+])
+async def test_list_query_plan_uses_indexes(db_session, repository, filters, after):
+    stmt = repository.list_statement(limit=101, after=after, filters=filters)
+    sql = str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = [row[-1] for row in (await db_session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).all()]
+
+    assert plan[0].startswith("SEARCH products USING INDEX"), plan
+    assert not any(step.startswith("SCAN products") for step in plan), plan
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+@pytest.mark.asyncio
+async def test_writes_bump_catalog_and_product_versions(db_session, repository):
+    start = await repository.get_catalog_version(db_session)
+
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product", price=100.0, category_id="CAT1"))
+    assert await repository.get_version(db_session, "MLB1") == start + 1
+
+    await repository.create_many(db_session, [ProductCreateSchema(id="MLB2", title="Test Product", price=100.0, category_id="CAT1")])
+    await repository.delete_by_id(db_session, "MLB1")
+    assert await repository.get_catalog_version(db_session) == start + 3
+
+    # A re-created product never reuses the version of its previous incarnation
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product", price=100.0, category_id="CAT1"))
+    assert await repository.get_version(db_session, "MLB1") == start + 4
+    assert await repository.get_version(db_session, "MISSING") is None
+
+@pytest.mark.asyncio
+async def test_stream_export_rows(db_session, repository):
+    for i in range(1, 4):
+        await repository.create(db_session, ProductCreateSchema(id=f"MLB{i}", title=f"Test Product {i}", price=10.0 * i, category_id="CAT1", description_text="Text" if i == 2 else None))
+
+    with count_queries() as statements:
+        rows = [row async for row in repository.stream_export_rows(db_session, batch_size=1, filters=ProductFilterSchema(min_price=20))]
+
+    assert len(statements) == 1
+    assert [dict(zip(EXPORT_FIELDS, row)) for row in rows] == [
+        {"id": "MLB2", "title": "Test Product 2", "price": 20.0, "currency_id": "BRL", "available_quantity": 0, "thumbnail": "",
+         "condition": "new", "category_id": "CAT1", "category_name": "Test Category", "description_text": "Text"},
+        {"id": "MLB3", "title": "Test Product 3", "price": 30.0, "currency_id": "BRL", "available_quantity": 0, "thumbnail": "",
+         "condition": "new", "category_id": "CAT1", "category_name": "Test Category", "description_text": None},
+    ]
+
+@pytest.mark.asyncio
+async def test_get_all_with_fields_loads_only_selected_columns(db_session, repository):
+    for i in range(1, 4):
+        await repository.create(db_session, ProductCreateSchema(id=f"MLB{i}", title=f"Test Product {i}", price=10.0 * i, category_id="CAT1", description_text=f"Description {i}"))
+    db_session.expunge_all()
+
+    with count_queries() as statements:
+        products = await repository.get_all(db_session, fields=frozenset({"id", "title", "thumbnail"}))
+
+    assert [p.title for p in products] == ["Test Product 1", "Test Product 2", "Test Product 3"]
+    assert len(statements) == 1
+    assert "product_descriptions" not in statements[0]
+    assert "condition" not in statements[0]
+
+@pytest.mark.asyncio
+async def test_get_product_with_details_with_fields_joins_selected_relationships(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product", price=10.0, category_id="CAT1", description_text="Text"))
+    db_session.expunge_all()
+
+    with count_queries() as statements:
+        product = await repository.get_product_with_details(db_session, "MLB1", fields=frozenset({"title", "category"}))
+        schema = product_projection(frozenset({"title", "category"})).model_validate(product)
+
+    assert len(statements) == 1
+    assert "product_descriptions" not in statements[0]
+    assert schema.model_dump() == {"title": "Test Product", "category": {"id": "CAT1", "name": "Test Category"}}
+
+@pytest.mark.asyncio
+async def test_reserve_many(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product 1", price=10.0, category_id="CAT1", available_quantity=5))
+    await repository.create(db_session, ProductCreateSchema(id="MLB2", title="Test Product 2", price=10.0, category_id="CAT1", available_quantity=1))
+    version = await repository.get_version(db_session, "MLB1")
+
+    with count_queries() as statements:
+        reserved, available = await repository.reserve_many(db_session, {"MLB1": 2, "MLB2": 1})
+
+    assert reserved is True
+    assert available == {"MLB1": 3, "MLB2": 0}
+    assert not any(s.startswith("SELECT") for s in statements)
+    assert await repository.get_version(db_session, "MLB1") > version
+
+@pytest.mark.asyncio
+async def test_reserve_many_is_all_or_nothing(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product 1", price=10.0, category_id="CAT1", available_quantity=5))
+    await repository.create(db_session, ProductCreateSchema(id="MLB2", title="Test Product 2", price=10.0, category_id="CAT1", available_quantity=1))
+
+    reserved, available = await repository.reserve_many(db_session, {"MLB1": 2, "MLB2": 2, "MISSING": 1})
+
+    assert reserved is False
+    assert available == {"MISSING": None, "MLB1": 5, "MLB2": 1}
+
+async def stored_detail(db_session, repository, product_id):
+    stored = await repository.get_detail_payload(db_session, product_id)
+    return None if stored is None else (stored[0], json.loads(stored[1]))
+
+async def rendered_detail(db_session, repository, product_id):
+    db_session.expunge_all()
+    product = await repository.get_product_with_details(db_session, product_id)
+    return product.version, json.loads(ProductSchema.model_validate(product).model_dump_json())
+
+@pytest.mark.asyncio
+async def test_detail_projection_follows_writes(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product", price=10.5, category_id="CAT1", available_quantity=3, description_text="Text"))
+    assert await stored_detail(db_session, repository, "MLB1") == await rendered_detail(db_session, repository, "MLB1")
+
+    await repository.reserve_many(db_session, {"MLB1": 1})
+    assert (await stored_detail(db_session, repository, "MLB1"))[1]["available_quantity"] == 2
+    assert await stored_detail(db_session, repository, "MLB1") == await rendered_detail(db_session, repository, "MLB1")
+
+    await repository.create_many(db_session, [ProductCreateSchema(id="MLB2", title="No category", price=1.0, category_id="CAT9")])
+    assert (await stored_detail(db_session, repository, "MLB2"))[1]["category"] is None
+    await repository.import_batch(db_session, [{"id": "CAT9", "name": "Late category"}], [], [])
+    assert (await stored_detail(db_session, repository, "MLB2"))[1]["category"] == {"id": "CAT9", "name": "Late category"}
+
+    await repository.delete_by_id(db_session, "MLB1")
+    assert await stored_detail(db_session, repository, "MLB1") is None
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("price", [0.30000000000000004, 123456789.12345679, 1e-7])
+async def test_stored_detail_bytes_match_the_schema_rendering(db_session, repository, price):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Título", price=price, category_id="CAT1", available_quantity=2))
+    await repository.reserve_many(db_session, {"MLB1": 1})
+
+    _, payload = await repository.get_detail_payload(db_session, "MLB1")
+
+    db_session.expunge_all()
+    product = await repository.get_product_with_details(db_session, "MLB1")
+    assert payload == ProductSchema.model_validate(product).model_dump_json().encode()
+
+@pytest.mark.asyncio
+async def test_rebuild_detail_projection(db_session, repository):
+    await repository.create(db_session, ProductCreateSchema(id="MLB1", title="Test Product", price=10.0, category_id="CAT1"))
+    await db_session.execute(text("DELETE FROM product_details"))
+    await db_session.commit()
+    assert await repository.detail_projection_is_empty(db_session) is True
+
+    assert await repository.rebuild_detail_projection(db_session) == 1
+
+    assert await repository.detail_projection_is_empty(db_session) is False
+    assert await stored_detail(db_session, repository, "MLB1") == await rendered_detail(db_session, repository, "MLB1")
@@ -1,17 +1,26 @@
+import asyncio
+import sqlite3
+from contextlib import nullcontext
 import pytest
 from unittest.mock import Mock, AsyncMock
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.product_service import ProductService
+from app.core.cache import LRUCache
+from app.core.singleflight import SingleFlight
 from app.domain.models import Product, Category, ProductDescription
-from app.domain.schemas import ProductCreateSchema
+from app.domain.schemas import ProductCreateSchema, ProductSchema, ProductFilterSchema, ProductSort, ReservationItemSchema
 
 @pytest.fixture
 def mock_repository():
-    return Mock()
+    repository = Mock()
+    # Products are not in the detail read model unless a test stores them there
+    repository.get_detail_payload = AsyncMock(return_value=None)
+    return repository
 
 @pytest.fixture
 def mock_db_session():
-    return Mock(spec=Session)
+    return Mock(spec=AsyncSession)
 
 @pytest.mark.asyncio
 async def test_create_product_success(mock_repository, mock_db_session):
@@ -92,3 +101,222 @@ async def test_delete_all_products(mock_repository, mock_db_session):
     result = await service.delete_all_products(mock_db_session)
     
     assert result.status_code == 200
+
+@pytest.mark.asyncio
+async def test_delete_products(mock_repository, mock_db_session):
+    mock_repository.delete_many = AsyncMock(return_value={"MLB1"})
+    cache = LRUCache(maxsize=10)
+    cache.set("MLB1", object())
+    service = ProductService(repository=mock_repository, detail_cache=cache)
+
+    result = await service.delete_products(mock_db_session, ["MLB1", "MLB2", "MLB1"])
+
+    assert result.status_code == 207
+    assert [(item.id, item.status_code) for item in result.data] == [("MLB1", 200), ("MLB2", 404)]
+    assert cache.get("MLB1") is None
+
+@pytest.mark.asyncio
+async def test_get_product_detail_served_from_cache(mock_repository, mock_db_session):
+    mock_product = Product(id="MLB1", title="Test Product", price=100.0, category_id="CAT1", currency_id="BRL", available_quantity=10, thumbnail="", condition="new")
+    mock_repository.get_product_with_details = AsyncMock(return_value=mock_product)
+    service = ProductService(repository=mock_repository, detail_cache=LRUCache(maxsize=10))
+
+    first = await service.get_product_detail(mock_db_session, "MLB1")
+    second = await service.get_product_detail(mock_db_session, "MLB1")
+
+    assert second is first
+    assert mock_repository.get_product_with_details.await_count == 1
+
+@pytest.mark.asyncio
+async def test_get_product_detail_projects_cached_detail(mock_repository, mock_db_session):
+    mock_product = Product(id="MLB1", title="Test Product", price=100.0, category_id="CAT1", currency_id="BRL", available_quantity=10, thumbnail="", condition="new", version=3)
+    mock_repository.get_product_with_details = AsyncMock(return_value=mock_product)
+    service = ProductService(repository=mock_repository, detail_cache=LRUCache(maxsize=10))
+    await service.get_product_detail(mock_db_session, "MLB1")
+
+    result = await service.get_product_detail(mock_db_session, "MLB1", fields=frozenset({"id", "price"}))
+
+    assert result.data.model_dump() == {"id": "MLB1", "price": 100.0}
+    assert result.data.version == 3
+    assert mock_repository.get_product_with_details.await_count == 1
+
+@pytest.mark.asyncio
+async def test_get_product_detail_coalesces_concurrent_misses(mock_repository, mock_db_session):
+    mock_product = Product(id="MLB1", title="Test Product", price=100.0, category_id="CAT1", currency_id="BRL", available_quantity=10, thumbnail="", condition="new")
+    release = asyncio.Event()
+
+    async def get_product_with_details(db, product_id):
+        await release.wait()
+        return mock_product
+
+    mock_repository.get_product_with_details = AsyncMock(side_effect=get_product_with_details)
+    flight = SingleFlight()
+    flight_session = Mock(spec=AsyncSession)
+    service = ProductService(
+        repository=mock_repository, detail_cache=LRUCache(maxsize=10), single_flight=flight,
+        session_factory=lambda: nullcontext(flight_session),
+    )
+
+    requests = [asyncio.create_task(service.get_product_detail(mock_db_session, "MLB1")) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*requests)
+
+    assert all(result.status_code == 200 for result in results)
+    assert mock_repository.get_product_with_details.await_count == 1
+    assert flight.coalesced == 9
+    # The shared load runs on its own session, not on the first caller's
+    mock_repository.get_product_with_details.assert_awaited_once_with(flight_session, "MLB1")
+
+@pytest.mark.asyncio
+async def test_reserve_product(mock_repository, mock_db_session):
+    mock_repository.reserve_many = AsyncMock(return_value=(True, {"MLB1": 3}))
+    cache = LRUCache(maxsize=10)
+    cache.set("MLB1", object())
+    service = ProductService(repository=mock_repository, detail_cache=cache)
+
+    result = await service.reserve_product(mock_db_session, "MLB1", 2)
+
+    assert result.status_code == 200
+    assert result.data.available_quantity == 3
+    assert cache.get("MLB1") is None
+    mock_repository.reserve_many.assert_awaited_once_with(mock_db_session, {"MLB1": 2})
+
+@pytest.mark.asyncio
+async def test_reserve_product_insufficient_stock(mock_repository, mock_db_session):
+    mock_repository.reserve_many = AsyncMock(return_value=(False, {"MLB1": 1}))
+    service = ProductService(repository=mock_repository)
+
+    result = await service.reserve_product(mock_db_session, "MLB1", 2)
+
+    assert result.status_code == 409
+    assert result.data.available_quantity == 1
+
+@pytest.mark.asyncio
+async def test_reserve_product_retries_when_database_is_busy(mock_repository, mock_db_session, monkeypatch):
+    busy = OperationalError("UPDATE products", {}, sqlite3.OperationalError("database is locked"))
+    mock_repository.reserve_many = AsyncMock(side_effect=[busy, busy, (True, {"MLB1": 0})])
+    monkeypatch.setattr("app.services.product_service.asyncio.sleep", AsyncMock())
+    service = ProductService(repository=mock_repository)
+
+    result = await service.reserve_product(mock_db_session, "MLB1", 1)
+
+    assert result.status_code == 200
+    assert mock_repository.reserve_many.await_count == 3
+
+@pytest.mark.asyncio
+async def test_reserve_product_gives_up_when_database_stays_busy(mock_repository, mock_db_session, monkeypatch):
+    busy = OperationalError("UPDATE products", {}, sqlite3.OperationalError("database is locked"))
+    mock_repository.reserve_many = AsyncMock(side_effect=busy)
+    monkeypatch.setattr("app.services.product_service.asyncio.sleep", AsyncMock())
+    service = ProductService(repository=mock_repository)
+
+    result = await service.reserve_product(mock_db_session, "MLB1", 1)
+
+    assert result.status_code == 503
+    assert mock_repository.reserve_many.await_count == 4
+
+@pytest.mark.asyncio
+async def test_reserve_cart_merges_items_and_reports_each(mock_repository, mock_db_session):
+    mock_repository.reserve_many = AsyncMock(return_value=(False, {"MLB1": 5, "MLB2": 1, "MLB3": None}))
+    service = ProductService(repository=mock_repository)
+    items = [
+        ReservationItemSchema(product_id="MLB1", quantity=1),
+        ReservationItemSchema(product_id="MLB2", quantity=2),
+        ReservationItemSchema(product_id="MLB1", quantity=1),
+        ReservationItemSchema(product_id="MLB3"),
+    ]
+
+    result = await service.reserve_cart(mock_db_session, items)
+
+    mock_repository.reserve_many.assert_awaited_once_with(mock_db_session, {"MLB1": 2, "MLB2": 2, "MLB3": 1})
+    assert result.status_code == 409
+    assert [(item.id, item.status_code) for item in result.data] == [("MLB1", 200), ("MLB2", 409), ("MLB3", 404)]
+
+@pytest.mark.asyncio
+async def test_get_product_detail_served_from_read_model(mock_repository, mock_db_session):
+    payload = b'{"id":"MLB1","title":"Test Product","price":100.0,"currency_id":"BRL","available_quantity":10,"thumbnail":"","condition":"new","category_id":"CAT1","category":null,"description":null}'
+    mock_repository.get_detail_payload = AsyncMock(return_value=(7, payload))
+    mock_repository.get_product_with_details = AsyncMock()
+    service = ProductService(repository=mock_repository)
+
+    result = await service.get_product_detail(mock_db_session, "MLB1")
+
+    assert result.status_code == 200
+    assert result.data.version == 7
+    assert result.render() == b'{"status_code":200,"message":"Product retrieved successfully.","data":' + payload + b"}"
+    mock_repository.get_product_with_details.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_cached_read_model_detail_is_parsed_only_for_projections(mock_repository, mock_db_session, monkeypatch):
+    payload = b'{"id":"MLB1","title":"Test Product","price":100.0,"currency_id":"BRL","available_quantity":10,"thumbnail":"","condition":"new","category_id":"CAT1","category":null,"description":null}'
+    mock_repository.get_detail_payload = AsyncMock(return_value=(7, payload))
+    service = ProductService(repository=mock_repository, detail_cache=LRUCache(maxsize=10))
+    parse = Mock(wraps=ProductSchema.model_validate_json)
+    monkeypatch.setattr(ProductSchema, "model_validate_json", parse)
+
+    await service.get_product_detail(mock_db_session, "MLB1")
+    assert await service.get_product_version(mock_db_session, "MLB1") == 7
+    assert parse.call_count == 0
+
+    result = await service.get_product_detail(mock_db_session, "MLB1", fields=frozenset({"id", "price"}))
+
+    assert result.data.model_dump() == {"id": "MLB1", "price": 100.0}
+    assert result.data.version == 7
+    assert parse.call_count == 1
+
+@pytest.mark.asyncio
+async def test_delete_product_invalidates_cache(mock_repository, mock_db_session):
+    mock_product = Product(id="MLB1", title="Test Product", price=100.0, category_id="CAT1", currency_id="BRL", available_quantity=10, thumbnail="", condition="new")
+    mock_repository.get_product_with_details = AsyncMock(return_value=mock_product)
+    mock_repository.delete_by_id = AsyncMock(return_value=True)
+    service = ProductService(repository=mock_repository, detail_cache=LRUCache(maxsize=10))
+
+    await service.get_product_detail(mock_db_session, "MLB1")
+    await service.delete_product(mock_db_session, "MLB1")
+
+    mock_repository.get_product_with_details = AsyncMock(return_value=None)
+    result = await service.get_product_detail(mock_db_session, "MLB1")
+    assert result.status_code == 404
+
+@pytest.mark.asyncio
+async def test_create_products_batch(mock_repository, mock_db_session):
+    mock_repository.get_existing_ids = AsyncMock(return_value={"MLB1"})
+    mock_repository.create_many = AsyncMock()
+    service = ProductService(repository=mock_repository)
+    schemas = [
+        ProductCreateSchema(id="MLB1", title="Test 1", price=10.0, category_id="CAT1"),
+        ProductCreateSchema(id="MLB2", title="Test 2", price=20.0, category_id="CAT1"),
+    ]
+
+    result = await service.create_products_batch(mock_db_session, schemas)
+
+    assert result.status_code == 207
+    assert [item.status_code for item in result.data] == [400, 201]
+    created = mock_repository.create_many.await_args.args[1]
+    assert [p.id for p in created] == ["MLB2"]
+
+@pytest.mark.asyncio
+async def test_get_all_products_price_cursor_round_trip(mock_repository, mock_db_session):
+    mock_products = [
+        Product(id="MLB1", title="Test 1", price=10.0, category_id="CAT1", currency_id="BRL", available_quantity=10, thumbnail="", condition="new"),
+        Product(id="MLB2", title="Test 2", price=20.0, category_id="CAT1", currency_id="BRL", available_quantity=10, thumbnail="", condition="new")
+    ]
+    mock_repository.get_all = AsyncMock(return_value=mock_products)
+    service = ProductService(repository=mock_repository)
+    filters = ProductFilterSchema(sort=ProductSort.PRICE)
+
+    result = await service.get_all_products(mock_db_session, limit=1, filters=filters)
+    assert [p.id for p in result.data] == ["MLB1"]
+
+    await service.get_all_products(mock_db_session, limit=1, after=result.next_cursor, filters=filters)
+    assert mock_repository.get_all.await_args.kwargs["after"] == (10.0, "MLB1")
+
+@pytest.mark.asyncio
+async def test_get_all_products_invalid_cursor(mock_repository, mock_db_session):
+    mock_repository.get_all = AsyncMock(return_value=[])
+    service = ProductService(repository=mock_repository)
+
+    result = await service.get_all_products(mock_db_session, after="not-a-cursor", filters=ProductFilterSchema(sort=ProductSort.PRICE))
+
+    assert result.status_code == 400
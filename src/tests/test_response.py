@@ -0,0 +1,61 @@
+import gzip
+import json
+import pytest
+from app.core.response import ExtensionResponse, PaginatedResponseExtension, ResponseExtension
+from app.domain.schemas import CategorySchema, ProductSchema
+
+def make_product(product_id: str) -> ProductSchema:
+    return ProductSchema(
+        id=product_id, title="Produto ação", price=10.0, currency_id="BRL", available_quantity=1,
+        thumbnail="", condition="new", category_id="CAT1", category=CategorySchema(id="CAT1", name="Cat")
+    )
+
+def test_render_matches_model_dump():
+    result = PaginatedResponseExtension.page(status_code=200, data=[make_product("MLB1"), make_product("MLB2")], next_cursor="MLB2")
+    assert json.loads(result.render()) == result.model_dump()
+
+def test_render_is_memoized():
+    result = ResponseExtension.response(status_code=200, data=make_product("MLB1"))
+    assert result.render() is result.render()
+
+def test_extension_response_uses_envelope_status():
+    result = ResponseExtension.response(status_code=404, message="Product not found.")
+    response = ExtensionResponse(result)
+    assert response.status_code == 404
+    assert response.headers["content-type"] == "application/json"
+    assert json.loads(response.body) == {"status_code": 404, "message": "Product not found.", "data": None}
+
+@pytest.mark.asyncio
+async def test_compressed_is_memoized_per_encoding():
+    result = ResponseExtension.response(status_code=200, data=[make_product(f"MLB{i}") for i in range(50)])
+    body = await result.compressed("gzip")
+    assert gzip.decompress(body) == result.render()
+    assert await result.compressed("gzip") is body
+
+async def send_response(response: ExtensionResponse, accept_encoding: str) -> list:
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await response(scope, None, send)
+    return messages
+
+@pytest.mark.asyncio
+async def test_extension_response_sends_negotiated_compressed_body():
+    result = ResponseExtension.response(status_code=200, data=[make_product(f"MLB{i}") for i in range(50)])
+    start, body = await send_response(ExtensionResponse(result, headers={"ETag": '"p-MLB1-1"'}), "gzip")
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert headers[b"etag"] == b'W/"p-MLB1-1"'
+    assert int(headers[b"content-length"]) == len(body["body"])
+    assert body["body"] is await result.compressed("gzip")
+
+@pytest.mark.asyncio
+async def test_extension_response_keeps_small_bodies_plain():
+    result = ResponseExtension.response(status_code=404, message="Product not found.")
+    start, body = await send_response(ExtensionResponse(result), "gzip")
+    assert b"content-encoding" not in dict(start["headers"])
+    assert body["body"] == result.render()
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from app.core.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    runs = []
+
+    async def load():
+        runs.append(1)
+        await release.wait()
+        return "value"
+
+    callers = [asyncio.create_task(flight.do("a", load)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*callers) == ["value"] * 5
+    assert len(runs) == 1
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 4, "errors": 0}
+
+@pytest.mark.asyncio
+async def test_completed_calls_are_not_reused():
+    flight = SingleFlight()
+    results = iter([1, 2])
+
+    async def load():
+        return next(results)
+
+    assert await flight.do("a", load) == 1
+    assert await flight.do("a", load) == 2
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_waiter():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        raise RuntimeError("boom")
+
+    callers = [asyncio.create_task(flight.do("a", load)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.errors == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_other_waiters():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        return "value"
+
+    first = asyncio.create_task(flight.do("a", load))
+    second = asyncio.create_task(flight.do("a", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "value"
+    assert first.cancelled()
+
+@pytest.mark.asyncio
+async def test_computation_is_cancelled_when_every_caller_is_gone():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def load():
+        started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    caller = asyncio.create_task(flight.do("a", load))
+    await started.wait()
+    caller.cancel()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert len(flight) == 0
+
+@pytest.mark.asyncio
+async def test_callers_after_a_cancellation_start_a_new_computation():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    results = iter(["abandoned", "fresh"])
+
+    async def load():
+        value = next(results)
+        started.set()
+        if value == "abandoned":
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                # Winds down slowly, so the next caller arrives before it is done
+                await asyncio.sleep(0.01)
+                raise
+        return value
+
+    caller = asyncio.create_task(flight.do("a", load))
+    await started.wait()
+    caller.cancel()
+    await asyncio.sleep(0)
+
+    assert await flight.do("a", load) == "fresh"
+    assert caller.cancelled()
+
+@pytest.mark.asyncio
+async def test_forget_starts_a_new_computation():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    results = iter(["stale", "fresh"])
+
+    async def load():
+        value = next(results)
+        await release.wait()
+        return value
+
+    before = asyncio.create_task(flight.do("a", load))
+    await asyncio.sleep(0)
+    flight.forget("a")
+    after = asyncio.create_task(flight.do("a", load))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await before == "stale"
+    assert await after == "fresh"
@@ -0,0 +1,76 @@
+import pstats
+import uuid
+import pytest
+from httpx import AsyncClient, ASGITransport
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from app.core.logging.logger import trace_id_var
+from app.core.middleware.trace_middleware import TraceMiddleware
+from app.core.profiling import RequestProfiler
+
+async def echo_trace_id(request):
+    async def body():
+        yield b"trace="
+        yield trace_id_var.get().encode()
+    return StreamingResponse(body(), media_type="text/plain")
+
+@pytest.fixture
+def ac():
+    app = Starlette(routes=[Route("/echo", echo_trace_id)])
+    app.add_middleware(TraceMiddleware)
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_generates_trace_id(ac):
+    async with ac:
+        response = await ac.get("/echo")
+    trace_id = response.headers["X-Trace-ID"]
+    assert uuid.UUID(trace_id)
+    assert response.headers["X-Process-Time"].endswith("s")
+    assert response.text == f"trace={trace_id}"
+
+@pytest.mark.asyncio
+async def test_propagates_incoming_trace_id(ac):
+    async with ac:
+        response = await ac.get("/echo", headers={"X-Trace-ID": "upstream-123"})
+    assert response.headers["X-Trace-ID"] == "upstream-123"
+    assert response.text == "trace=upstream-123"
+
+@pytest.mark.asyncio
+async def test_rejects_malformed_trace_id(ac):
+    async with ac:
+        response = await ac.get("/echo", headers={"X-Trace-ID": "bad id\twith spaces"})
+    assert response.headers["X-Trace-ID"] != "bad id\twith spaces"
+    assert uuid.UUID(response.headers["X-Trace-ID"])
+
+def profiled_client(profiler: RequestProfiler) -> AsyncClient:
+    app = Starlette(routes=[Route("/echo", echo_trace_id)])
+    app.add_middleware(TraceMiddleware, profiler=profiler)
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_profiles_request_with_token_header(tmp_path):
+    async with profiled_client(RequestProfiler(str(tmp_path), token="secret")) as ac:
+        response = await ac.get("/echo", headers={"X-Profile": "secret", "X-Trace-ID": "slow-1"})
+        assert response.headers["X-Profile"] == "slow-1"
+
+        response = await ac.get("/echo", headers={"X-Profile": "wrong"})
+        assert "X-Profile" not in response.headers
+        response = await ac.get("/echo")
+        assert "X-Profile" not in response.headers
+
+    assert [path.name for path in tmp_path.iterdir()] == ["slow-1.prof"]
+    stats = pstats.Stats(str(tmp_path / "slow-1.prof"))
+    assert any(function == "echo_trace_id" for _, _, function in stats.stats)
+
+@pytest.mark.asyncio
+async def test_profiles_sampled_requests(tmp_path):
+    async with profiled_client(RequestProfiler(str(tmp_path), sample_rate=1.0)) as ac:
+        response = await ac.get("/echo")
+    assert (tmp_path / f"{response.headers['X-Trace-ID']}.prof").exists()
+
+def test_profiler_is_disabled_without_token_or_rate(tmp_path):
+    assert not RequestProfiler(str(tmp_path)).enabled
+    # The header alone cannot trigger a profile while no token is configured
+    assert RequestProfiler(str(tmp_path), sample_rate=0.0, token="").start({"type": "http", "headers": [(b"x-profile", b"")]}) is None
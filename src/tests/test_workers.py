@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from app.core.cache import LRUCache
+from app.core.config import Settings
+from app.core.workers import SharedCounter, notify_workers, shared_change_counter, startup_lock
+
+def file_settings(tmp_path) -> Settings:
+    return Settings(database_url=f"sqlite+aiosqlite:///{tmp_path / 'catalog.db'}")
+
+def test_no_shared_counter_for_memory_database():
+    assert shared_change_counter(Settings(database_url="sqlite+aiosqlite:///:memory:")) is None
+
+def test_shared_counter_is_seen_by_every_handle(tmp_path):
+    first = shared_change_counter(file_settings(tmp_path))
+    second = SharedCounter(first.path)
+    assert first.value == second.value == 0
+
+    assert first.increment() == 1
+    assert second.increment() == 2
+    assert first.value == 2
+
+def test_shared_counter_remembers_the_changed_keys(tmp_path):
+    counter = shared_change_counter(file_settings(tmp_path))
+    counter.increment("p1")
+    counter.increment("p2")
+    assert counter.changed_keys(0, 2) == ["p1", "p2"]
+
+    counter.increment()
+    assert counter.changed_keys(1, 3) is None
+
+def test_cache_drops_keys_written_by_another_worker(tmp_path):
+    config = file_settings(tmp_path)
+    worker_a = LRUCache(maxsize=10, shared_counter=shared_change_counter(config))
+    worker_b = LRUCache(maxsize=10, shared_counter=shared_change_counter(config))
+    worker_a.set("p1", "a1")
+    worker_a.set("p2", "a2")
+    worker_b.set("p1", "b1")
+
+    worker_b.invalidate("p1")
+
+    # Only the written key is dropped, in the other worker too
+    assert worker_b.stats()["remote_invalidations"] == 0
+    assert worker_a.get("p1") is None
+    assert worker_a.get("p2") == "a2"
+    assert worker_a.stats()["remote_invalidations"] == 1
+    assert worker_a.stats()["remote_clears"] == 0
+
+def test_cache_is_cleared_when_the_changed_keys_are_unknown(tmp_path):
+    config = file_settings(tmp_path)
+    worker_a = LRUCache(maxsize=10, shared_counter=shared_change_counter(config))
+    worker_b = LRUCache(maxsize=10, shared_counter=shared_change_counter(config))
+    worker_a.set("p1", "a1")
+    worker_a.set("p2", "a2")
+
+    # More changes than the ring holds
+    for n in range(300):
+        worker_b.invalidate(f"other-{n}")
+
+    assert worker_a.get("p2") is None
+    assert worker_a.stats()["remote_clears"] == 1
+    worker_a.set("p2", "a2")
+    assert worker_a.get("p2") == "a2"
+
+def test_stale_load_is_not_cached_after_another_worker_write(tmp_path):
+    config = file_settings(tmp_path)
+    worker_a = LRUCache(maxsize=10, shared_counter=shared_change_counter(config))
+    generation = worker_a.generation
+
+    notify_workers(config)
+
+    worker_a.set("p1", "stale", generation=generation)
+    assert worker_a.get("p1") is None
+
+@pytest.mark.asyncio
+async def test_startup_lock_runs_one_worker_at_a_time(tmp_path):
+    config = file_settings(tmp_path)
+    events = []
+
+    async def start(name):
+        async with startup_lock(config):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.05)
+            events.append(f"{name} done")
+
+    await asyncio.gather(start("a"), start("b"))
+    assert events in (["a start", "a done", "b start", "b done"], ["b start", "b done", "a start", "a done"])